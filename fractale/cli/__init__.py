@@ -4,13 +4,7 @@ import argparse
 import os
 import sys
 
-# This will pretty print all exceptions in rich
-from rich.traceback import install
-
-install()
-
 import fractale
-from fractale.logger import setup_logger
 
 
 def get_parser():
@@ -120,6 +114,11 @@ def run_fractale():
     """
     this is the main entrypoint.
     """
+    # Show the version without building the parser
+    if sys.argv[1:] in (["version"], ["--version"]):
+        print(fractale.__version__)
+        sys.exit(0)
+
     parser = get_parser()
 
     def help(return_code=0):
@@ -144,6 +143,14 @@ def run_fractale():
         print(fractale.__version__)
         sys.exit(0)
 
+    # These are slow to import (the logger pulls in fastmcp), so we wait
+    # until a command needs them.
+    # This will pretty print all exceptions in rich
+    from rich.traceback import install
+
+    from fractale.logger import setup_logger
+
+    install()
     setup_logger(quiet=args.quiet, debug=args.debug)
 
     # Here we can assume instantiated to get args
@@ -47,5 +47,7 @@ def main(args, extra, **kwargs):
 
     # Clean up or close database if relevant
     finally:
+        if hasattr(engine, "close"):
+            engine.close()
         if database:
             database.close()
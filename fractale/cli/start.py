@@ -6,10 +6,6 @@ from fractale.app import init_mcp
 from fractale.routes import *
 from fractale.tools.manager import ToolManager
 
-# Discover and register defaults
-manager = ToolManager()
-manager.register()
-
 
 def main(args, extra, **kwargs):
     """
@@ -18,6 +14,10 @@ def main(args, extra, **kwargs):
     """
     mcp = init_mcp(args.exclude, args.include, args.mask_error_details)
 
+    # Discover and register defaults
+    manager = ToolManager()
+    manager.register()
+
     # Create ASGI app from MCP server
     mcp_app = mcp.http_app(path="/mcp")
     app = FastAPI(title="Fractale MCP", lifespan=mcp_app.lifespan)
@@ -35,7 +35,7 @@ def main(args, extra, **kwargs):
         print(f"   ✅ Registered: {tool.name}")
 
     # Plus additional tools, prompts, resources
-    for tool in register(mcp, args):
+    for tool in register(manager, mcp, args):
         print(f"   ✅ Registered: {tool.name}")
 
     # Mount the MCP server. Note from V: we can use mount with antother FastMCP
@@ -56,7 +56,7 @@ def main(args, extra, **kwargs):
         print("🖥️  Shutting down...")
 
 
-def register(mcp, args):
+def register(manager, mcp, args):
     """
     Register additional tools, resources, and prompts.
     """
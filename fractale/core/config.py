@@ -1,8 +1,11 @@
 import os
 from dataclasses import dataclass
 
+# Resolved configs by (provider, model), see ModelConfig.from_context
+_model_configs = {}
 
-@dataclass
+
+@dataclass(frozen=True)
 class ModelConfig:
     provider: str
     model_name: str
@@ -15,9 +18,15 @@ class ModelConfig:
         Extracts config from the Blackboard Context (YAML Inputs).
         """
         # The llm provider is the backend
-        provider = context.get("backend") or os.environ.get("LLM_PROVIDER", "gemini")
+        provider = (context.get("backend") or os.environ.get("LLM_PROVIDER", "gemini")).lower()
         model = context.get("model") or os.environ.get("LLM_MODEL")
 
+        # Every step resolves its config, but credentials don't change during a run.
+        # Configs are frozen, since the same instance is shared across steps.
+        key = (provider, model)
+        if key in _model_configs:
+            return _model_configs[key]
+
         # I'm not sure I like this approach yet. The model config here would discover
         # credentials from the environment each time is it init'd. Is that something
         # we can (and should) rely on? Are there any security issues?
@@ -33,4 +42,13 @@ class ModelConfig:
         elif provider == "gemini":
             api_key = os.environ.get("GEMINI_API_KEY")
 
-        return cls(provider=provider.lower(), model_name=model, api_key=api_key, base_url=base_url)
+        config = cls(provider=provider, model_name=model, api_key=api_key, base_url=base_url)
+        _model_configs[key] = config
+        return config
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Forget resolved configs, e.g., to read rotated credentials from the environment.
+        """
+        _model_configs.clear()
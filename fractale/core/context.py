@@ -2,6 +2,9 @@ import collections
 
 from fractale.logger import logger
 
+# Keys a step writes that are cleared when the context is reset
+reset_keys = ("return_code", "result", "error_message")
+
 
 def get_context(context):
     """
@@ -29,8 +32,7 @@ class Context(collections.UserDict):
         """
         Reset the return code and result.
         """
-        for key in ["return_code", "result", "error_message"]:
-            self.data[key] = None
+        self.data.update(dict.fromkeys(reset_keys))
 
     def is_managed(self):
         """
@@ -1,4 +1,9 @@
+import copy
 import logging
+import os
+import sys
+from collections import Counter
+from functools import lru_cache
 
 import fractale.core.plan.schema as schema
 import fractale.utils as utils
@@ -7,6 +12,25 @@ from fractale.core.plan.step import Step
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=32)
+def _parse_plan(path, mtime_ns, size):
+    """
+    Parse a plan file. The stat fields are only part of the cache key.
+    """
+    return utils.read_yaml(path)
+
+
+def read_plan(path):
+    """
+    Read a plan file, parsing it again only if it changed on disk.
+
+    We return a copy, since compiling the plan changes the steps.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return copy.deepcopy(_parse_plan(path, stat.st_mtime_ns, stat.st_size))
+
+
 class Plan:
     """
     A plan describes a state machine or orchestration.
@@ -15,21 +39,34 @@ class Plan:
     orchestrators (TBA).
     """
 
-    def __init__(self, plan_path_or_dict):
+    def __init__(self, plan_path_or_dict, pre_validated=False):
+        """
+        A plan dict built (and validated) by the caller can skip schema validation
+        with pre_validated. Plans read from a file are always validated.
+        """
         if isinstance(plan_path_or_dict, dict):
             self.raw_data = plan_path_or_dict
             self.plan_path = "memory"
         else:
             self.plan_path = plan_path_or_dict
-            self.raw_data = utils.read_yaml(self.plan_path)
+            self.raw_data = read_plan(self.plan_path)
+            pre_validated = False
 
-        # Validation
-        self.validate_schema()
-        self.validate_transitions()
+        # Validation (transitions are checked as we compile)
+        if pre_validated:
+            schema.apply_defaults(self.raw_data)
+        else:
+            self.validate_schema()
 
         # YAML List -> state graph
         self.states = self.do_compile(self.raw_data.get("steps", []))
 
+        # The state marked initial, or the first (non terminal) one defined
+        first = next((s.name for s in self.states.values() if s.type != "final"), None)
+        self._initial_state = next(
+            (s.name for s in self.states.values() if s.get("initial")), first
+        )
+
     def validate_schema(self):
         return schema.validate_plan(self.raw_data)
 
@@ -38,8 +75,26 @@ class Plan:
         Converts the list into a State Machine Config.
         """
         compiled = {}
+
+        # Names, prompts, and input keys are looked up (and compared) every
+        # transition, so we intern them once here
+        for step_data in raw_steps:
+            for key in "name", "prompt":
+                if isinstance(step_data.get(key), str):
+                    step_data[key] = sys.intern(step_data[key])
+            if isinstance(step_data.get("inputs"), dict):
+                step_data["inputs"] = {sys.intern(k): v for k, v in step_data["inputs"].items()}
         step_names = [s["name"] for s in raw_steps]
 
+        # A repeated name would silently replace the earlier step
+        if len(set(step_names)) != len(step_names):
+            name, count = Counter(step_names).most_common(1)[0]
+            raise ValueError(f"❌ Plan Error: step '{name}' is defined {count} times.")
+
+        # The next step for a linear flow, and all valid destinations
+        next_names = step_names[1:] + ["success"]
+        valid_targets = set(step_names) | {"success", "failed"}
+
         # Add Terminal States
         compiled["success"] = Step({"name": "success", "type": "final"})
         compiled["failed"] = Step({"name": "failed", "type": "final"})
@@ -49,8 +104,9 @@ class Plan:
 
             # If no transitions defined, assume linear flow (e.g., MuMMI)
             if "transitions" not in step_data:
-                next_node = step_names[i + 1] if (i + 1 < len(step_names)) else "success"
-                step_data["transitions"] = {"success": next_node, "failure": "failed"}
+                step_data["transitions"] = {"success": next_names[i], "failure": "failed"}
+            else:
+                self.validate_transitions(step_data, valid_targets)
 
             # Mark initial state (0)
             if i == 0:
@@ -63,35 +119,23 @@ class Plan:
     @property
     def initial_state(self):
         """
-        Find the state marked initial, or the first one defined
+        The state marked initial, or the first one defined
         """
-        for s in self.states.values():
-            if getattr(s, "initial", False):
-                return s.name
-        return list(self.states.keys())[0] if self.states else None
+        return self._initial_state
 
     @property
     def global_inputs(self):
         return self.raw_data.get("inputs", {})
 
-    def validate_transitions(self):
+    def validate_transitions(self, step, valid_targets):
         """
-        Ensures all transition targets exist in the plan or are valid terminals.
+        Ensures a step's transition targets exist in the plan or are valid terminals.
         """
-        steps = self.raw_data.get("steps", [])
-
-        # Get all valid destination names
-        defined_names = {s["name"] for s in steps}
-        valid_targets = defined_names.union({"success", "failed"})
-
-        # Check edges like a graph
-        for step in steps:
-            transitions = step.get("transitions", {})
-            for event, target in transitions.items():
-                if target not in valid_targets:
-                    raise ValueError(
-                        f"❌ Invalid Transition in step '{step['name']}':\n"
-                        f"   Cannot transition on '{event}' to '{target}'.\n"
-                        f"   '{target}' is not defined in the steps.\n"
-                        f"   Valid targets: {sorted(list(valid_targets))}"
-                    )
+        for event, target in step["transitions"].items():
+            if target not in valid_targets:
+                raise ValueError(
+                    f"❌ Invalid Transition in step '{step['name']}':\n"
+                    f"   Cannot transition on '{event}' to '{target}'.\n"
+                    f"   '{target}' is not defined in the steps.\n"
+                    f"   Valid targets: {sorted(valid_targets)}"
+                )
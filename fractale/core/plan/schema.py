@@ -1,11 +1,27 @@
+import copy
+import os
+from functools import lru_cache
+
 import jsonschema
 from jsonschema import validators
 
+# Optional, it generates python code for the schema
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+
+validate_properties = jsonschema.Draft7Validator.VALIDATORS["properties"]
+
 
 def set_defaults(validator, properties, instance, schema):
-    for prop, sub_schema in properties.items():
-        if "default" in sub_schema:
-            instance.setdefault(prop, sub_schema["default"])
+    if validator.is_type(instance, "object"):
+        for prop, sub_schema in properties.items():
+            if "default" in sub_schema:
+                instance.setdefault(prop, sub_schema["default"])
+    # Still validate the properties (e.g., the type of each step field)
+    yield from validate_properties(validator, properties, instance, schema)
 
 
 plan_validator = validators.extend(
@@ -53,9 +69,104 @@ plan_schema = {
 }
 
 
+@lru_cache(maxsize=None)
+def get_validator():
+    """
+    The (strict) validate function, built once since the schema is fixed.
+
+    With fastjsonschema we compile the schema to a function (that also fills
+    in defaults), otherwise we use jsonschema with the set_defaults extension.
+    """
+    if fastjsonschema is not None:
+        return fastjsonschema.compile(plan_schema, use_default=True)
+    return plan_validator(plan_schema).validate
+
+
+# Validate with jsonschema, instead of the (faster) checks in check_plan
+strict_schema = os.environ.get("FRACTALE_STRICT_SCHEMA") is not None
+
+# Defaults from the schema, for the plan and for each step
+plan_defaults = {k: v["default"] for k, v in plan_schema["properties"].items() if "default" in v}
+step_defaults = {
+    k: v["default"]
+    for k, v in plan_schema["properties"]["steps"]["items"]["properties"].items()
+    if "default" in v
+}
+
+# The schema keywords (and types) check_plan knows how to check
+json_types = {"string": str, "boolean": bool, "object": dict, "array": list}
+known_keywords = {
+    "type",
+    "enum",
+    "default",
+    "properties",
+    "additionalProperties",
+    "required",
+    "items",
+    "minItems",
+}
+
+
+def check_plan(data, schema=plan_schema):
+    """
+    Check data against the schema in Python, and return True if it is valid.
+
+    This only knows the keywords the plan schema uses. Anything it can't vouch
+    for (invalid, or an unknown keyword) returns False, and validate_plan falls
+    back to the full validator for it.
+    """
+    if not known_keywords.issuperset(schema):
+        return False
+    if "type" in schema and not isinstance(data, json_types.get(schema["type"], ())):
+        return False
+    if "enum" in schema and data not in schema["enum"]:
+        return False
+
+    if isinstance(data, dict):
+        properties = schema.get("properties", {})
+        if any(key not in data for key in schema.get("required", [])):
+            return False
+        if (
+            schema.get("additionalProperties", True) is not True
+            and not properties.keys() >= data.keys()
+        ):
+            return False
+        for key, subschema in properties.items():
+            if key in data and not check_plan(data[key], subschema):
+                return False
+
+    elif isinstance(data, list):
+        if len(data) < schema.get("minItems", 0):
+            return False
+        if "items" in schema and not all(check_plan(item, schema["items"]) for item in data):
+            return False
+    return True
+
+
+def apply_defaults(data):
+    """
+    Fill in schema defaults for the plan and its steps.
+    """
+    for key, value in plan_defaults.items():
+        data.setdefault(key, copy.deepcopy(value))
+    for step in data.get("steps", []):
+        for key, value in step_defaults.items():
+            step.setdefault(key, value)
+
+
 def validate_plan(data):
-    validator = plan_validator(plan_schema)
-    try:
-        validator.validate(data)
-    except Exception as e:
-        raise ValueError(f"❌ Plan YAML invalid: {e}!")
+    """
+    Validate a plan and fill in defaults.
+
+    The schema is small and fixed, so by default we check it in Python, which is
+    much faster than jsonschema. A plan the check can't vouch for is validated
+    with the full validator, for the error. Set FRACTALE_STRICT_SCHEMA to always
+    use the full validator.
+    """
+    if strict_schema or not check_plan(data):
+        try:
+            get_validator()(data)
+        except Exception as e:
+            raise ValueError(f"❌ Plan YAML invalid: {e}!")
+        return
+    apply_defaults(data)
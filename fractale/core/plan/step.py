@@ -2,6 +2,20 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Context keys for the engine, never passed to a prompt or shown as context
+ignored_keys = frozenset(
+    {
+        "agent_config",
+        "managed",
+        "max_loops",
+        "max_attempts",
+        "result",
+        "error_message",
+        "schemas",
+        "validate",
+    }
+)
+
 
 class Step:
     """
@@ -9,16 +23,54 @@ class Step:
     for easier access to stuff.
     """
 
+    # A plan can have many steps, and we read their fields every transition.
+    # The spec isn't changed once the plan is compiled, so we read the fields
+    # from it once.
+    __slots__ = (
+        "spec",
+        "_prompt_args",
+        "name",
+        "type",
+        "prompt",
+        "allow_tools",
+        "validate",
+        "tool",
+        "args",
+        "inputs",
+        "instruction",
+        "max_attempts",
+        "transitions",
+        "description",
+    )
+
     def __init__(self, spec):
         self.spec = spec
         self._prompt_args = None
 
+        self.name = spec["name"]
+        self.type = spec.get("type", "agent")
+        self.prompt = spec.get("prompt")
+
+        # If False, the Agent is forbidden from calling tools.
+        # It must generate text/code.
+        self.allow_tools = spec.get("allow_tools", True)
+        self.validate = spec.get("validate")
+        self.tool = spec.get("tool")
+        self.args = spec.get("args") or {}
+        self.inputs = spec.get("inputs") or {}
+        self.instruction = spec.get("instruction")
+
+        # Step limit on attempts, if set (else the engine's limit)
+        self.max_attempts = self.inputs.get("max_attempts")
+        self.transitions = spec.get("transitions", {})
+        self.description = spec.get("description", f"Action: {self.name}")
+
     def set_schema(self, valid_args: set):
         """
         Called by Manager after connecting to Server.
         Defines which arguments the Prompt function accepts.
         """
-        self._prompt_args = valid_args
+        self._prompt_args = frozenset(valid_args)
 
     def partition_inputs(self, full_context: dict) -> tuple[dict, dict]:
         """
@@ -28,70 +80,20 @@ class Step:
         if self._prompt_args is None:
             return full_context, {}
 
+        # The context can be large, so we keep the argument names in a local
+        args = self._prompt_args
         prompt_args = {}
         background_info = {}
-
-        # Keys to ignore
-        ignored = {
-            "agent_config",
-            "managed",
-            "max_loops",
-            "max_attempts",
-            "result",
-            "error_message",
-            "schemas",
-            "validate",
-        }
-
         for key, value in full_context.items():
-            if key in self._prompt_args:
+            if key in args:
                 prompt_args[key] = value
-            elif key not in ignored:
+            elif key not in ignored_keys:
                 background_info[key] = value
 
         # Useful for debugging
-        print(prompt_args)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Prompt arguments for %s: %s", self.name, list(prompt_args))
         return prompt_args, background_info
 
-    @property
-    def name(self):
-        return self.spec["name"]
-
-    @property
-    def type(self):
-        return self.spec.get("type", "agent")
-
-    @property
-    def prompt(self):
-        return self.spec.get("prompt")
-
-    @property
-    def allow_tools(self):
-        """
-        If False, the Agent is forbidden from calling tools.
-        It must generate text/code.
-        """
-        return self.spec.get("allow_tools", True)
-
-    @property
-    def validate(self):
-        return self.spec.get("validate")
-
-    @property
-    def tool(self):
-        return self.spec.get("tool")
-
-    @property
-    def inputs(self):
-        return self.spec.get("inputs", {})
-
-    @property
-    def transitions(self):
-        return self.spec.get("transitions", {})
-
-    @property
-    def description(self):
-        return self.spec.get("description", f"Action: {self.name}")
-
     def get(self, key, default=None):
         return self.spec.get(key, default)
@@ -14,6 +14,13 @@ class Database(ABC):
         """
         pass
 
+    def append_step(self, step: Dict[str, Any]):
+        """
+        Optionally save a step as soon as it finishes.
+        Return where it was saved, or None if it wasn't.
+        """
+        return None
+
     def connect(self):
         """Optional setup hook."""
         pass
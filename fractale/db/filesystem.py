@@ -3,6 +3,7 @@ from datetime import datetime
 from typing import Any, Dict
 
 import fractale.utils as utils
+import fractale.utils.jsonio as jsonio
 
 from .base import Database
 
@@ -16,6 +17,13 @@ class JsonDatabase(Database):
     def __init__(self, path: str):
         self.set_base_dir(path)
 
+        # Result files are named for when the database was created, and numbered
+        self.run_stamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        self.save_count = 0
+
+        # Steps of the current run, appended as they finish (json lines)
+        self.steps_file = None
+
     def set_base_dir(self, path: str):
         """
         Handle file:// or json:// prefixes or raw path
@@ -28,6 +36,24 @@ class JsonDatabase(Database):
             self.base_dir = path
         self.base_dir = os.path.expanduser(os.path.expandvars(self.base_dir))
 
+    def append_step(self, step: Dict[str, Any]):
+        """
+        Append a step to the run's steps file, so finished steps are on disk
+        (and not only in memory) while the workflow runs.
+        """
+        try:
+            line = jsonio.dumps(step) + "\n"
+        except (TypeError, ValueError):
+            return None
+
+        if self.steps_file is None:
+            os.makedirs(self.base_dir, exist_ok=True)
+            filename = f"steps-{self.run_stamp}-{self.save_count}.jsonl"
+            self.steps_file = os.path.join(self.base_dir, filename)
+        with open(self.steps_file, "a") as fd:
+            fd.write(line)
+        return self.steps_file
+
     def save(self, data: Dict[str, Any]):
         """
         Save a result (data) to filesystem.
@@ -35,7 +61,12 @@ class JsonDatabase(Database):
         if not os.path.exists(self.base_dir):
             os.makedirs(self.base_dir)
 
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        filename = f"results-{timestamp}.json"
+        # Point to the full steps, and start a new file for the next run
+        if self.steps_file is not None:
+            data = {**data, "steps_file": self.steps_file}
+            self.steps_file = None
+
+        filename = f"results-{self.run_stamp}-{self.save_count}.json"
+        self.save_count += 1
         filepath = os.path.join(self.base_dir, filename)
-        utils.write_json(filepath, data)
+        utils.write_json(data, filepath)
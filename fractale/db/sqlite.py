@@ -1,11 +1,15 @@
-import json
+import logging
 import os
 import sqlite3
 from datetime import datetime
 from typing import Any, Dict
 
+import fractale.utils.jsonio as jsonio
+
 from .base import Database
 
+logger = logging.getLogger(__name__)
+
 
 class SqliteDatabase(Database):
     """
@@ -25,7 +29,8 @@ class SqliteDatabase(Database):
         if directory and not os.path.exists(directory):
             os.makedirs(directory)
 
-        self.conn = sqlite3.connect(self.db_path)
+        # Results can be saved from a background thread (one at a time)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
         self._migrate()
 
     def _migrate(self):
@@ -49,17 +54,17 @@ class SqliteDatabase(Database):
         timestamp = datetime.now().isoformat()
         status = data.get("status", "unknown")
         plan_source = data.get("plan_source", "unknown")
-        json_data = json.dumps(data)
+        json_data = jsonio.dumps(data)
 
         try:
             with self.conn:
-                self.conn.execute(
+                cursor = self.conn.execute(
                     "INSERT INTO workflow_runs (timestamp, status, plan_source, data) VALUES (?, ?, ?, ?)",
                     (timestamp, status, plan_source, json_data),
                 )
-            print(f"💾 Results saved to SQLite: {self.db_path} (ID: last_insert_rowid)")
+            logger.info(f"💾 Results saved to SQLite: {self.db_path} (ID: {cursor.lastrowid})")
         except Exception as e:
-            print(f"❌ Failed to save results to SQLite: {e}")
+            logger.error(f"❌ Failed to save results to SQLite: {e}")
 
     def close(self):
         if self.conn:
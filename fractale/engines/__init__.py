@@ -1,15 +1,10 @@
-from fractale.core.plan import Plan
-
-
 def get_engine(plan, engine="native", backend="gemini", ui=None, max_attempts=5, database=None):
     """
     Get the fractale engine! 🚘
 
     This is new, and will allow us to support different orchestators.
+    Engines (and the plan) are imported here, so we only load the one we use.
     """
-    # This is loading the plan path
-    plan = Plan(plan)
-
     # State machine orchestration
     if engine == "native":
         from fractale.engines.native.engine import Manager
@@ -19,4 +14,12 @@ def get_engine(plan, engine="native", backend="gemini", ui=None, max_attempts=5,
 
     elif engine == "autogen":
         from fractale.engines.autogen.engine import Manager
+
+    else:
+        raise ValueError(f"Engine '{engine}' is not known: choose native, langchain, or autogen.")
+
+    from fractale.core.plan import Plan
+
+    # This is loading the plan path
+    plan = Plan(plan)
     return Manager(plan=plan, backend=backend, ui=ui, max_attempts=max_attempts, database=database)
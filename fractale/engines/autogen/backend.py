@@ -1,4 +1,6 @@
+import copy
 import os
+from functools import lru_cache
 
 from fractale.core.config import ModelConfig
 
@@ -7,38 +9,49 @@ def get_agent_config(context: dict):
     """
     Constructs the LLM configuration dictionary required by AutoGen agents.
     Adapts Fractale's ModelConfig to AutoGen's specific keys.
+
+    Steps usually share a model, so the config is built once per model
+    config. Each caller gets its own copy.
     """
     cfg = ModelConfig.from_context(context)
+    llm_config = build_agent_config(cfg.provider, cfg.model_name, cfg.api_key, cfg.base_url)
+    return copy.deepcopy(llm_config)
+
 
+@lru_cache(maxsize=8)
+def build_agent_config(provider, model_name, api_key, base_url):
+    """
+    Build the AutoGen LLM configuration for a model.
+    """
     config_list_entry = {
-        "model": cfg.model_name,
-        "api_key": cfg.api_key,
+        "model": model_name,
+        "api_key": api_key,
     }
 
     # Gemini is a little different
-    if cfg.provider == "openai":
+    if provider == "openai":
         config_list_entry["api_type"] = "openai"
         # Organization?
         # config_list_entry["organization"] = blaaa
 
-    elif cfg.provider == "llama":
+    elif provider == "llama":
         # AutoGen treats local models as openai type with a custom base_url
         config_list_entry["api_type"] = "openai"
-        config_list_entry["base_url"] = cfg.base_url or "http://localhost:11434/v1"
+        config_list_entry["base_url"] = base_url or "http://localhost:11434/v1"
 
         # Ollama often requires a dummy key if none provided
         if not config_list_entry["api_key"]:
             config_list_entry["api_key"] = "ollama"
 
-    elif cfg.provider == "gemini":
+    elif provider == "gemini":
         # pip install pyautogen[gemini]
         config_list_entry["api_type"] = "google"
-        cfg.model_name = os.environ.get("GOOGLE_MODEL_NAME") or "gemini-2.5-pro"
+        model_name = os.environ.get("GOOGLE_MODEL_NAME") or "gemini-2.5-pro"
 
     else:
-        raise ValueError(f"AutoGen Engine: Provider '{cfg.provider}' not supported.")
+        raise ValueError(f"AutoGen Engine: Provider '{provider}' not supported.")
 
-    config_list_entry["model"] = cfg.model_name
+    config_list_entry["model"] = model_name
 
     # Don't read from disk cache
     llm_config = {
@@ -1,22 +1,27 @@
-import json
 import logging
 import re
+import time
+from collections import ChainMap
 
 import autogen
 
 import fractale.engines.autogen.warnings  # noqa
 import fractale.utils as utils
+import fractale.utils.jsonio as jsonio
 from fractale.core.context import get_context
 from fractale.engines.autogen.backend import get_agent_config
 from fractale.engines.autogen.tools import register_mcp_capabilities
 from fractale.engines.base import AgentBase
-from fractale.utils.timer import Timer
 
 logger = logging.getLogger(__name__)
 
 logging.getLogger("google.auth").setLevel(logging.ERROR)
 logging.getLogger("autogen").setLevel(logging.ERROR)
 
+# Markdown code blocks, and the words that end a chat
+_CODE_BLOCK_RE = re.compile(r"```(?:\w+)?\s*\n(.*?)\n\s*```", re.DOTALL)
+_TERMINATION_RE = re.compile("(COMPLETE|TERMINATE|FINISH)")
+
 
 class Manager(AgentBase):
     """
@@ -44,11 +49,10 @@ class Manager(AgentBase):
                 context[k] = v
 
         self.init()
-        utils.run_sync(self.connect_and_validate())
 
         try:
             self.metadata["status"] = "running"
-            tracker = utils.run_sync(self.run_loop(context))
+            tracker = utils.run_sync(self.arun(context))
 
             self.metadata["status"] = "Succeeded"
             self.save_results(tracker)
@@ -64,29 +68,49 @@ class Manager(AgentBase):
                 self.ui.on_workflow_complete("Failed")
             raise e
 
+    async def arun(self, context):
+        """
+        Validate and run the plan in one MCP session.
+
+        The client is reentrant, so the session opened here is reused by
+        connect_and_validate and run_loop (one handshake for the run).
+        """
+        async with self:
+            await self.connect_and_validate()
+            return await self.run_loop(context)
+
     async def connect_and_validate(self):
         """
         Connect and validate the client with the plan.
         """
-        async with self.client:
-            server_prompts = await self.client.list_prompts()
+        async with self:
+            server_prompts = await self.list_prompts()
             p_list = (
                 server_prompts.prompts if hasattr(server_prompts, "prompts") else server_prompts
             )
-            schema_map = {p.name: {a.name for a in p.arguments} for p in p_list}
+
+            # We only need argument names for prompts the plan uses
+            needed = {s.prompt for s in self.plan.states.values() if s.type == "agent"}
+            schema_map = {
+                p.name: frozenset(a.name for a in p.arguments or ())
+                for p in p_list
+                if p.name in needed
+            }
 
             for step in self.plan.states.values():
                 if step.type == "agent":
                     if step.prompt in schema_map:
                         step.set_schema(schema_map[step.prompt])
                     else:
-                        logger.warning(f"⚠️ Prompt '{step.prompt}' not found on server during init.")
+                        logger.warning(
+                            f"⚠️ Prompt '{step.prompt}' not found on server during init."
+                        )
 
     def extract_code_block(self, text):
         """
         Match block of code, assuming llm returns as markdown or code block.
         """
-        match = re.search(r"```(?:\w+)?\s*\n(.*?)\n\s*```", text, re.DOTALL)
+        match = _CODE_BLOCK_RE.search(text)
         # Extract content from ```json ... ``` blocks if present
         if match:
             return match.group(1).strip()
@@ -98,9 +122,8 @@ class Manager(AgentBase):
         Main async running loop
         """
         tracker = []
-        timer = Timer()
 
-        async with self.client:
+        async with self:
             steps_list = self.plan.raw_data.get("steps", [])
 
             for step_conf in steps_list:
@@ -108,26 +131,27 @@ class Manager(AgentBase):
                 step = self.plan.states[step_name]
 
                 # Safely get inputs
-                raw_inputs = step.spec.get("inputs") or {}
+                raw_inputs = step.inputs
                 if self.ui:
                     self.ui.on_step_start(step.name, step.description, raw_inputs)
 
                 result = None
                 error = None
 
-                # Resolve inputs (safely handling empty)
+                # Resolve inputs (safely handling empty). Steps only read their
+                # context, so the inputs are layered over it instead of copying it.
                 resolved_inputs = utils.resolve_templates(raw_inputs, context)
-                step_context = context.copy()
-                step_context.update(resolved_inputs)
-
-                with timer:
-                    try:
-                        if step.type == "agent":
-                            result = await self.run_agent(step, step_context)
-                        elif step.type == "tool":
-                            result = await self.run_tool(step, step_context)
-                    except Exception as e:
-                        error = str(e)
+                step_context = ChainMap(resolved_inputs, context.data)
+
+                start = time.perf_counter_ns()
+                try:
+                    if step.type == "agent":
+                        result = await self.run_agent(step, step_context)
+                    elif step.type == "tool":
+                        result = await self.run_tool(step, step_context)
+                except Exception as e:
+                    error = str(e)
+                duration = (time.perf_counter_ns() - start) / 1e9
 
                 if self.ui:
                     self.ui.on_step_finish(step.name, str(result), error, {})
@@ -141,27 +165,28 @@ class Manager(AgentBase):
 
                     # Store raw previous result
                     context["_previous_result"] = result
-                    context[f"{step.name}_result"] = result
 
-                    # Attempt JSON Parse and Merge
+                    # Attempt JSON Parse (extract_code_block already stripped it)
+                    parsed_data = None
                     try:
-                        parsed_data = None
-                        if isinstance(clean_result, str) and clean_result.strip().startswith("{"):
-                            parsed_data = json.loads(clean_result)
+                        if isinstance(clean_result, str) and clean_result.startswith("{"):
+                            parsed_data = jsonio.loads(clean_result)
                         elif isinstance(result, dict):
                             parsed_data = result
-
-                        if isinstance(parsed_data, dict):
-                            context.update(parsed_data)
-                            context.result = parsed_data
-                            context[f"{step.name}_result"] = parsed_data
                     except Exception:
                         context.result = result
 
+                    # Merge a parsed object, and store the step result once
+                    step_result = result
+                    if isinstance(parsed_data, dict):
+                        context.update(parsed_data)
+                        context.result = step_result = parsed_data
+                    context[f"{step.name}_result"] = step_result
+
                 tracker.append(
                     {
                         "step": step.name,
-                        "duration": timer.elapsed_time,
+                        "duration": duration,
                         "result": result,
                         "error": error,
                     }
@@ -184,16 +209,14 @@ class Manager(AgentBase):
         try:
             prompt_res = await self.client.get_prompt(step.prompt, arguments=prompt_args)
             system_msg = "\n\n".join(
-                [
-                    m.content.text if hasattr(m.content, "text") else str(m.content)
-                    for m in prompt_res.messages
-                ]
+                m.content.text if hasattr(m.content, "text") else str(m.content)
+                for m in prompt_res.messages
             )
         except Exception as e:
             raise RuntimeError(f"Error rendering prompt '{step.prompt}': {e}")
 
         # Inject extra instruction from plan
-        extra_instruction = step.spec.get("instruction")
+        extra_instruction = step.instruction
         if extra_instruction:
             # We treat the instruction string as a template so it can use {{ variables }}
             # Wrap in dict to use existing utility
@@ -226,13 +249,12 @@ class Manager(AgentBase):
             if not content:
                 return False
             # Check for explicit completion or JSON object conclusion
-            if re.search("(COMPLETE|TERMINATE|FINISH)", content):
+            if _TERMINATION_RE.search(content):
                 return True
             return False
 
         # Safe retrieval of max_attempts
-        step_inputs = step.spec.get("inputs") or {}
-        max_replies = step_inputs.get("max_attempts", self.max_attempts)
+        max_replies = self.max_attempts if step.max_attempts is None else step.max_attempts
 
         user_proxy = autogen.UserProxyAgent(
             name="user_proxy",
@@ -247,7 +269,7 @@ class Manager(AgentBase):
             await register_mcp_capabilities(assistant, user_proxy, self.client)
 
         def format_context(d):
-            return "\n".join([f"{k}: {v}" for k, v in d.items() if not k.startswith("_")])
+            return "\n".join(f"{k}: {v}" for k, v in d.items() if k[:1] != "_")
 
         init_msg = f"Begin task.\n\nCONTEXT:\n{format_context(context_data)}"
         chat_res = await user_proxy.a_initiate_chat(assistant, message=init_msg)
@@ -263,25 +285,28 @@ class Manager(AgentBase):
             return ""
 
         for msg in reversed(history):
-            content = msg.get("content", "")
-            role = msg.get("role", "")
+            content = msg.get("content")
             if not content:
                 continue
 
+            # Messages can be long, so we look at the start (and fences) once
+            role = msg.get("role", "")
+            is_object = content.lstrip()[:1] == "{"
+
             # First get assistant output
             if role == "assistant":
-                if "```json" in content or (content.strip().startswith("{") and "}" in content):
+                fence = "```" in content
+                if (is_object and "}" in content) or (fence and "```json" in content):
                     logger.info("✅ Extracted result from Assistant JSON.")
                     return content
-                if "```" in content:
+                if fence:
                     logger.info("✅ Extracted result from Assistant Code Block.")
                     return content
 
             # Then get tool output
-            if role == "user" or role == "tool":
-                if content.strip().startswith("{"):
-                    logger.info("✅ Extracted result from Tool Output.")
-                    return content
+            elif role in ("user", "tool") and is_object:
+                logger.info("✅ Extracted result from Tool Output.")
+                return content
 
         return chat_res.summary
 
@@ -292,7 +317,7 @@ class Manager(AgentBase):
         tool_name = step.tool
 
         # Safely get args
-        raw_args = step.spec.get("args") or {}
+        raw_args = step.args
         tool_args = utils.resolve_templates(raw_args, context)
 
         logger.info(f"🛠️ AutoGen Manager executing tool: {tool_name}")
@@ -1,8 +1,24 @@
+import asyncio
+import hashlib
 import os
+import time
 
 from fastmcp import Client
 from fastmcp.client.transports import StreamableHttpTransport
 
+import fractale.engines.patches  # noqa
+import fractale.utils.jsonio as jsonio
+from fractale.engines.http_client import get_http_client
+
+# Tool and prompt schemas rarely change in a session, cache listings (seconds).
+# We don't persist them to disk: a development server can change its tools
+# without changing its version, and a stale schema fails at call time.
+listing_ttl = int(os.environ.get("FRACTALE_MCP_LISTING_TTL", 60))
+_listings = {}
+
+# Listing requests in flight, so concurrent agents share one round trip
+_inflight = {}
+
 
 class AgentBase:
     def init(self):
@@ -13,7 +29,93 @@ class AgentBase:
         port = os.environ.get("FRACTALE_MCP_PORT", "8089")
         token = os.environ.get("FRACTALE_MCP_TOKEN")
         url = f"http://127.0.0.1:{port}/mcp"
+        self.url = url
 
         headers = {"Authorization": token} if token else None
-        transport = StreamableHttpTransport(url=url, headers=headers)
+        transport = StreamableHttpTransport(
+            url=url, headers=headers, httpx_client_factory=get_http_client
+        )
         self.client = Client(transport)
+
+    async def __aenter__(self):
+        """
+        Open the MCP session for the agent. The fastmcp client is reentrant,
+        so nested use only does the initialize handshake once.
+        """
+        if getattr(self, "client", None) is None:
+            self.init()
+        await self.client.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return await self.client.__aexit__(exc_type, exc, tb)
+
+    async def list_tools(self):
+        """
+        List tools from the server, cached for the listing ttl.
+        """
+        return await self.cached_listing("tools", self.client.list_tools)
+
+    async def list_prompts(self):
+        """
+        List prompts from the server, cached for the listing ttl.
+        """
+        return await self.cached_listing("prompts", self.client.list_prompts)
+
+    def server_key(self):
+        """
+        Identify the server by url, and by name and version once connected.
+
+        A server restarted on the same port with a new version doesn't get
+        the listings of the old one.
+        """
+        result = getattr(self.client, "initialize_result", None)
+        info = getattr(result, "serverInfo", None)
+        if info is None:
+            return (self.url,)
+        return (self.url, info.name, info.version)
+
+    async def cached_listing(self, kind, func):
+        """
+        Shared by all agents (and runs) talking to the same server.
+
+        Concurrent misses for the same listing wait on the first request
+        instead of each sending their own.
+        """
+        key = (*self.server_key(), kind)
+        hit = _listings.get(key)
+        if hit and time.monotonic() - hit[0] < listing_ttl:
+            return hit[1]
+
+        # Futures are bound to a loop, so only share within the running one
+        loop = asyncio.get_running_loop()
+        pending = _inflight.get(key)
+        if pending is not None and pending.get_loop() is loop:
+            return await asyncio.shield(pending)
+
+        pending = loop.create_future()
+        _inflight[key] = pending
+        try:
+            result = await func()
+            _listings[key] = (time.monotonic(), result)
+            pending.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            # Don't warn about an exception nobody else retrieved
+            pending.exception()
+            raise
+        finally:
+            if _inflight.get(key) is pending:
+                del _inflight[key]
+
+    def hash_tools(self, tools):
+        """
+        Content hash of tool schemas, so we know when a backend needs a re-init.
+        """
+        schemas = [[t.name, t.description, t.inputSchema] for t in tools]
+        content = jsonio.dumps(schemas, sort_keys=True)
+        return hashlib.blake2b(content.encode()).hexdigest()
@@ -0,0 +1,96 @@
+import asyncio
+import atexit
+import weakref
+
+import httpx
+
+# HTTP/2 needs the h2 package (pip install httpx[http2])
+try:
+    import h2  # noqa
+
+    http2 = True
+except ImportError:
+    http2 = False
+
+# Connection pool shared by every MCP client in the process
+limits = httpx.Limits(max_connections=200, max_keepalive_connections=100, keepalive_expiry=30)
+
+# LLM completions can take minutes, so we wait on reads like the openai sdk does
+llm_timeout = httpx.Timeout(600.0, connect=5.0)
+
+# Connection pools by the event loop that owns them. A pool goes away with its loop
+_transports = weakref.WeakKeyDictionary()
+
+
+class SharedTransport(httpx.AsyncBaseTransport):
+    """
+    Wrap the shared connection pool for one httpx client.
+
+    fastmcp (via the mcp streamable http client) closes its httpx client
+    when a session ends. We don't want that to tear down the pool, so closing
+    this wrapper is a no-op and the pool is closed by close_http_client.
+
+    The pool is looked up per request, so a client made on one event loop
+    keeps working on the next one.
+    """
+
+    async def handle_async_request(self, request):
+        return await get_transport().handle_async_request(request)
+
+    async def aclose(self):
+        pass
+
+
+def get_transport():
+    """
+    Get (or create) the connection pool for the running event loop.
+
+    Connections are bound to the event loop that opened them, so each loop
+    gets its own pool, closed on that loop by close_http_client. When h2 is
+    installed, HTTP/2 is offered through TLS ALPN, so concurrent tool calls to
+    an https server multiplex over one connection. Plain http stays on HTTP/1.1.
+    """
+    loop = asyncio.get_running_loop()
+    transport = _transports.get(loop)
+    if transport is None:
+        transport = _transports[loop] = httpx.AsyncHTTPTransport(limits=limits, http2=http2)
+    return transport
+
+
+def get_http_client(headers=None, timeout=None, auth=None):
+    """
+    httpx client factory for the fastmcp StreamableHttpTransport.
+
+    This mirrors the mcp defaults (follow redirects, 30s timeout), but every
+    client shares the same keepalive pool so we don't pay connection setup per session.
+    """
+    return httpx.AsyncClient(
+        transport=SharedTransport(),
+        headers=headers,
+        timeout=timeout or httpx.Timeout(30.0),
+        auth=auth,
+        follow_redirects=True,
+    )
+
+
+async def close_http_client():
+    """
+    Close the connection pool of the running event loop.
+    """
+    transport = _transports.pop(asyncio.get_running_loop(), None)
+    if transport is not None:
+        await transport.aclose()
+
+
+@atexit.register
+def close_at_exit():
+    """
+    Best effort cleanup of the pools whose loops are still usable.
+    """
+    for loop in list(_transports):
+        if loop.is_closed() or loop.is_running():
+            continue
+        try:
+            loop.run_until_complete(close_http_client())
+        except Exception:
+            pass
@@ -73,8 +73,8 @@ class Manager(AgentBase):
             raise e
 
     async def connect_and_validate(self):
-        async with self.client:
-            prompts = await self.client.list_prompts()
+        async with self:
+            prompts = await self.list_prompts()
             p_list = prompts.prompts if hasattr(prompts, "prompts") else prompts
             schema_map = {p.name: {a.name for a in p.arguments} for p in p_list}
             for step in self.plan.states.values():
@@ -82,7 +82,7 @@ class Manager(AgentBase):
                     step.set_schema(schema_map[step.prompt])
 
     async def build_and_run_graph(self, context):
-        async with self.client:
+        async with self:
             lc_tools = await get_langchain_tools(self.client)
             workflow = StateGraph(Dict[str, Any])
 
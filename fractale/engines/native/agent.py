@@ -1,17 +1,101 @@
-import json
+import asyncio
+import os
 import re
+import reprlib
 import time
-
-from rich import print
+from collections import deque
 
 # Native Engine Imports
 import fractale.engines.native.backends as backends
 import fractale.utils as utils
+import fractale.utils.jsonio as jsonio
 from fractale.core.config import ModelConfig
 from fractale.engines.base import AgentBase
+from fractale.engines.native.cache import decision_cache, response_cache
 from fractale.engines.native.result import parse_tool_response
 from fractale.logger import logger
 
+# Maximum tool calls from one LLM turn to run at once
+tool_concurrency = int(os.environ.get("FRACTALE_TOOL_CONCURRENCY", 8))
+
+# Most recent tool steps to keep in a worker's metadata
+max_step_history = int(os.environ.get("FRACTALE_MAX_STEP_HISTORY", 1000))
+
+# Markdown code blocks, and the subset that wrap a json object or list
+_CODE_BLOCK_RE = re.compile(r"```(?:\w+)?\s*\n(.*?)\n\s*```", re.DOTALL)
+_JSON_BLOCK_RE = re.compile(r"```(?:\w+)?\s*(\{.*?\}|\[.*?\])\s*```", re.DOTALL)
+
+# Finish decision the check_finished_prompt asks for. Strict schemas require
+# every property, so a decision without a next instruction has it null.
+decision_schema = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string", "enum": ["success", "failure"]},
+        "instruction": {"type": ["string", "null"]},
+    },
+    "required": ["action", "instruction"],
+    "additionalProperties": False,
+}
+
+# Bounded repr for snippets of (possibly huge) non-string tool outputs
+_snippet_repr = reprlib.Repr()
+_snippet_repr.maxstring = 200
+_snippet_repr.maxother = 200
+
+
+class JsonScanner:
+    """
+    Find the end of the first json object in streamed text.
+
+    Text before the object (e.g., a ```json fence) is skipped, and we track
+    strings and escapes so braces inside them don't count. Each character is
+    only scanned once, however the text is split into chunks.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.pos = 0
+        self.start = None
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, chunk):
+        """
+        Add streamed text, and return the object text once it closes (else None).
+        """
+        self.text += chunk
+        for i in range(self.pos, len(self.text)):
+            char = self.text[i]
+            if self.start is None:
+                if char == "{":
+                    self.start, self.depth = i, 1
+            elif self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == "{":
+                self.depth += 1
+            elif char == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.pos = i + 1
+                    return self.text[self.start : i + 1]
+        self.pos = len(self.text)
+
+
+def canonical_json(obj):
+    """
+    Byte-stable json for anything we send to the LLM, so repeated content
+    hits provider prefix caching.
+    """
+    return jsonio.dumps(obj, sort_keys=True)
+
 
 class WorkerAgent(AgentBase):
     """
@@ -20,27 +104,52 @@ class WorkerAgent(AgentBase):
     No inheritance from global base classes.
     """
 
-    def __init__(self, name: str, step, ui=None, max_attempts=None):
+    def __init__(self, name: str, step, ui=None, max_attempts=None, session=None):
         self.name = name
+        self.ui = ui
+
+        # The manager can share its (open) MCP session
+        self.client = session.client if session else None
+        self.url = session.url if session else None
+        self.tools_hash = None
 
+        # The backend is kept between runs while the model config is the same
+        self.backend = None
+        self.model_config = None
+        self.reset(step, max_attempts)
+
+    def reset(self, step, max_attempts=None):
+        """
+        Prepare to run a step (again), keeping the session and backend.
+        """
         # The agent is responsible for a step.
         # this is basically a config for the step
         self.step = step
-        self.ui = ui
         self.max_attempts = max_attempts or 5
-        self.client = None
+
+        # Finish decisions and responses to cache if the step succeeds
+        # (prompt, llm_key, decision) and (instruction, llm_key, result)
+        self.decisions = []
+        self.responses = []
+
+        # A new dict, since the manager keeps the metadata of earlier runs
         self.metadata = {
-            "name": name,
+            "name": self.name,
             "status": "pending",
             "times": {},
-            "steps": [],
+            "steps": deque(maxlen=max_step_history),
             "llm_usage": [],
         }
 
     def run(self, context):
+        """
+        Synchronous wrapper around arun, for running a worker standalone.
+        """
+        return utils.run_sync(self.arun(context))
+
+    async def arun(self, context):
         """
         Main entry point called by the Manager.
-        Synchronous wrapper around the async execution loop.
         """
         self.ui.log(f"▶️  '{self.name}' starting...")
         start_time = time.time()
@@ -52,9 +161,13 @@ class WorkerAgent(AgentBase):
             raise ValueError(f"Worker {self.name} missing 'source_prompt' in context.")
 
         try:
-            result = utils.run_sync(self.run_async(prompt_name, context))
+            result = await self.run_async(prompt_name, context)
             context.result = result
             self.metadata["status"] = "success"
+            for prompt, llm_key, decision in self.decisions:
+                decision_cache.confirm(prompt, llm_key, decision)
+            for instruction, llm_key, response in self.responses:
+                response_cache.update(instruction, llm_key, response)
 
         except Exception as e:
             self.metadata["status"] = "failed"
@@ -72,16 +185,23 @@ class WorkerAgent(AgentBase):
         Sets up connections and runs the async loop.
         """
         start_exec = time.time()
+        self.decisions = []
+        self.responses = []
 
-        # Setup fastmcp client and choose a backend
-        self.init()
+        # Setup fastmcp client (unless shared) and choose a backend
+        if self.client is None:
+            self.init()
         self.init_backend(context)
 
-        async with self.client:
+        async with self:
 
             # Get tools available for running session.
-            mcp_tools = await self.client.list_tools()
-            await self.backend.initialize(mcp_tools)
+            # The backend only needs to convert them again if they changed.
+            mcp_tools = await self.list_tools()
+            tools_hash = self.hash_tools(mcp_tools)
+            if tools_hash != self.tools_hash:
+                await self.backend.initialize(mcp_tools)
+                self.tools_hash = tools_hash
 
             # Derive the persona (prompt) from mcp server.
             context_data = getattr(context, "data", context)
@@ -89,7 +209,7 @@ class WorkerAgent(AgentBase):
             instruction = await self.fetch_persona(prompt_name, prompt_args)
 
             # Since we are moving between steps, add the context
-            instruction += self.add_context(instruction, remainder)
+            instruction = self.add_context(instruction, remainder)
 
             # Once we get here, we have a specific instruction (with a persona)
             # And we want to allow the agent to work on the task in a loop
@@ -115,7 +235,7 @@ class WorkerAgent(AgentBase):
 
             # Format value nicely
             if isinstance(v, (dict, list)):
-                val_str = json.dumps(v, indent=2)
+                val_str = jsonio.dumps(v, indent=True, sort_keys=True)
             else:
                 val_str = str(v)
 
@@ -125,12 +245,17 @@ class WorkerAgent(AgentBase):
 
     def init_backend(self, context):
         """
-        Create the backend from the model config.
+        Create the backend from the model config, or reset the one we have.
         """
         cfg = ModelConfig.from_context(context)
         if cfg.provider not in backends.BACKENDS:
             raise ValueError(f"Provider '{cfg.provider}' not supported.")
-        self.backend = backends.BACKENDS[cfg.provider](config=cfg)
+        if self.backend is not None and cfg == self.model_config:
+            self.backend.reset()
+        else:
+            self.backend = backends.BACKENDS[cfg.provider](config=cfg)
+            self.model_config = cfg
+        self.tools_hash = None
 
     async def fetch_persona(self, prompt_name, arguments):
         """
@@ -152,7 +277,7 @@ class WorkerAgent(AgentBase):
             text = "\n\n".join(msgs)
 
             # Add user custom instruction (note does not support jinja)
-            text += self.step.spec.get("instruction") or ""
+            text += self.step.instruction or ""
             return text
         except Exception as e:
             raise RuntimeError(f"Failed to fetch persona '{prompt_name}': {e}")
@@ -178,12 +303,14 @@ class WorkerAgent(AgentBase):
         while loops < max_loops:
             loops += 1
             self.ui.log(f"🧠 Loop {loops}/{max_loops}")
-            print(instruction)
+            logger.debug(instruction)
 
-            response, reason, calls = self.backend.generate_response(
-                prompt=instruction,
+            # The backend history is fresh on the first loop, so the response is cacheable
+            response, reason, calls = await self.generate_response(
+                instruction,
                 use_tools=use_tools,
                 tools=[chosen_tool] if chosen_tool else None,
+                cacheable=loops == 1,
             )
 
             self.ui.log(reason)
@@ -209,34 +336,8 @@ class WorkerAgent(AgentBase):
                 self.ui.log("🛑 Agent finished (No tools called).")
                 return response
 
-            tool_outputs = []
-            has_global_error = False
-
             # Process all calls (Parallel tool use support)
-            for call in calls:
-                t_name = call["name"]
-                t_args = call["args"]
-                t_id = call.get("id")
-                self.ui.log(f"🛠️  Calling: {t_name}")
-
-                try:
-                    raw_result = await self.client.call_tool(t_name, t_args)
-                    parsed = parse_tool_response(raw_result)
-                    content = parsed.content
-
-                    if parsed.is_error:
-                        has_global_error = True
-                        if "❌" not in content and "Error" not in content:
-                            content = f"❌ ERROR: {content}"
-
-                except Exception as e:
-                    content = f"❌ ERROR: {e}"
-                    has_global_error = True
-
-                # Record and UI Update
-                self.record_step(t_name, t_args, content)
-                self.ui.log_update(content)
-                tool_outputs.append({"id": t_id, "name": t_name, "content": content})
+            tool_outputs, has_global_error = await self.call_tools(calls)
 
             # If we used a specific tool, checking the result is often enough
             if chosen_tool and not has_global_error:
@@ -247,15 +348,12 @@ class WorkerAgent(AgentBase):
                 # We dump the outputs into the check prompt
                 # TODO: if this isn't accurate, we should have an error code.
                 # and then fall back to this.
-                check_args = {"content": json.dumps([t["content"] for t in tool_outputs])}
+                check_args = {"content": canonical_json([t["content"] for t in tool_outputs])}
                 next_instruction = await self.fetch_persona("check_finished_prompt", check_args)
 
                 # The prompt asks the LLM to output a JSON decision
-                decision, _, _ = self.backend.generate_response(prompt=next_instruction)
-
-                # Parse decision
-                decision = json.loads(self.extract_code_block(decision))
-                print(decision)
+                decision = await self.decide(next_instruction)
+                logger.debug(f"Decision: {decision}")
 
                 # Return last output as result
                 if decision.get("action") == "success":
@@ -263,32 +361,193 @@ class WorkerAgent(AgentBase):
 
                 # TODO this isn't implemented yet, but add if needed
                 # Loop continues with new instructions/feedback
-                if "instruction" in decision:
+                if decision.get("instruction"):
                     instruction = decision["instruction"]
                 else:
-                    instruction = f"Tool outputs received:\n{json.dumps(tool_outputs)}\nProceed."
+                    instruction = (
+                        f"Tool outputs received:\n{canonical_json(tool_outputs)}\nProceed."
+                    )
 
             except Exception as e:
                 # Fallback if check prompt fails or doesn't exist
                 # Just feed the tool outputs back into the main loop
-                instruction = f"Tool outputs: {json.dumps(tool_outputs)}"
+                instruction = f"Tool outputs: {canonical_json(tool_outputs)}"
 
         return response
 
+    async def generate_response(self, instruction, use_tools=True, tools=None, cacheable=False):
+        """
+        Generate a response from the backend, using the response cache when we can.
+
+        We only cache when the answer should be deterministic: temperature 0,
+        no tools, and no prior conversation history. On a hit the backend is not
+        called, so the turn is not added to its history. Like decisions, a new
+        response is held until the step succeeds (see arun) before it is cached.
+        """
+        cacheable = cacheable and not use_tools and getattr(self.backend, "temperature", None) == 0
+        if not cacheable:
+            return await self.backend.generate_response(
+                prompt=instruction, use_tools=use_tools, tools=tools
+            )
+
+        llm_key = f"{self.backend.model_name}|{self.tools_hash}"
+        cached = response_cache.lookup(instruction, llm_key)
+        if cached is not None:
+            logger.debug(f"Response cache hit for {self.name}")
+            return cached
+
+        result = await self.backend.generate_response(
+            prompt=instruction, use_tools=use_tools, tools=tools
+        )
+
+        # Don't cache errors, which backends return as text
+        response, _, calls = result
+        if response and not calls and not response.startswith("Error"):
+            self.responses.append((instruction, llm_key, result))
+        return result
+
+    async def decide(self, prompt):
+        """
+        Ask the LLM for a (json) finish decision, from the decision cache when we can.
+
+        Like the response cache, we only use it at temperature 0. A new decision
+        is held until the step succeeds (see arun) before it is cached.
+        """
+        cacheable = getattr(self.backend, "temperature", None) == 0
+        llm_key = f"{self.backend.model_name}|{self.tools_hash}"
+        if cacheable:
+            decision = decision_cache.lookup(prompt, llm_key)
+            if decision is not None:
+                logger.debug(f"Decision cache hit for {self.name}")
+                return decision
+
+        # A schema constrained decision is valid the first time, else we stream it
+        if self.backend.supports_json_schema:
+            decision = await self.backend.generate_structured(prompt, decision_schema, "decision")
+        else:
+            decision = await self.stream_decision(prompt)
+            error, parsed = self.parse_json(decision)
+            decision = parsed if not error else await self.backend.ensure_json(decision)
+        if cacheable:
+            self.decisions.append((prompt, llm_key, decision))
+        return decision
+
+    async def stream_decision(self, prompt):
+        """
+        Get the decision text, stopping generation once the json object closes.
+
+        Models often add prose after the json, and we don't need to wait for it.
+        Backends that can't stream return the full response.
+        """
+        if not hasattr(self.backend, "generate_response_stream"):
+            response, _, _ = await self.backend.generate_response(
+                prompt=prompt, json_mode=True, tool_choice="none"
+            )
+            return response
+
+        scanner = JsonScanner()
+        events = self.backend.generate_response_stream(
+            prompt=prompt, json_mode=True, tool_choice="none"
+        )
+        try:
+            async for kind, value in events:
+                if kind == "text":
+                    found = scanner.feed(value)
+                    if found is not None:
+                        return found
+                elif kind == "done":
+                    return value[0]
+        finally:
+            await events.aclose()
+        return scanner.text
+
+    async def call_tools(self, calls):
+        """
+        Run a batch of tool calls concurrently, bounded by the tool concurrency.
+        Outputs are returned in the same order as the calls.
+
+        Note that we can't send these as one JSON-RPC batch: MCP servers reject
+        batch arrays (removed from the spec in 2025-06-18), so we overlap round
+        trips on the shared connection pool instead.
+
+        A tool error is returned as output (the LLM can recover from it), so it
+        doesn't stop the other calls. Anything else (or cancellation) cancels
+        the calls still running, instead of leaving them behind.
+        """
+        semaphore = asyncio.Semaphore(tool_concurrency)
+
+        async def bounded_call(call):
+            async with semaphore:
+                return await self.call_tool(call)
+
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(bounded_call(call)) for call in calls]
+        results = [task.result() for task in tasks]
+        has_error = any(is_error for _, is_error in results)
+        return [output for output, _ in results], has_error
+
+    async def call_tool(self, call):
+        """
+        Call one tool, returning the output for the LLM and if it was an error.
+        """
+        t_name = call["name"]
+        t_args = call["args"]
+        t_id = call.get("id")
+        self.ui.log(f"🛠️  Calling: {t_name}")
+        is_error = False
+
+        try:
+            raw_result = await self.client.call_tool(t_name, t_args)
+            parsed = parse_tool_response(raw_result)
+            content = parsed.content
+
+            if parsed.is_error:
+                is_error = True
+                if "❌" not in content and "Error" not in content:
+                    content = f"❌ ERROR: {content}"
+
+        except Exception as e:
+            content = f"❌ ERROR: {e}"
+            is_error = True
+
+        # Record and UI Update
+        self.record_step(t_name, t_args, content)
+        self.ui.log_update(content)
+        return {"id": t_id, "name": t_name, "content": content}, is_error
+
     def extract_code_block(self, text):
         """
         Match block of code, assuming llm returns as markdown or code block.
         """
-        match = re.search(r"```(?:\w+)?\s*\n(.*?)\n\s*```", text, re.DOTALL)
+        match = _CODE_BLOCK_RE.search(text)
         if match:
             return match.group(1).strip()
 
+    def parse_json(self, response):
+        """
+        Parse json from an LLM response in one pass, fenced or not.
+        Returns a tuple of (error, data).
+        """
+        if isinstance(response, dict):
+            return None, response
+        match = _JSON_BLOCK_RE.search(response) if isinstance(response, str) else None
+        payload = match.group(1) if match else response
+        try:
+            return None, jsonio.loads(payload)
+        except (jsonio.JSONDecodeError, TypeError) as e:
+            return str(e), None
+
     def record_step(self, tool, args, output):
+        # Don't stringify a large output just to keep the start of it
+        if isinstance(output, str):
+            snippet = output[:200]
+        else:
+            snippet = _snippet_repr.repr(output)[:200]
         self.metadata["steps"].append(
             {
                 "tool": tool,
                 "args": args,
-                "output_snippet": str(output)[:200],
+                "output_snippet": snippet,
                 "timestamp": time.time(),
             }
         )
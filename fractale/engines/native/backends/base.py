@@ -1,6 +1,176 @@
-import json
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+import random
+import re
+import time
+import weakref
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Tuple
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Union
+
+import fractale.utils.jsonio as jsonio
+
+logger = logging.getLogger(__name__)
+
+# A response wrapped in a markdown code fence (```json ... ```)
+_CODE_FENCE_RE = re.compile(r"^\s*```[\w-]*\s*\n?(.*?)\n?\s*```\s*$", re.DOTALL)
+
+
+def strip_code_fences(text):
+    """
+    Remove a markdown code fence wrapped around a response, if there is one.
+    """
+    match = _CODE_FENCE_RE.match(text)
+    return match.group(1) if match else text
+
+
+# Header of the system message that replaces summarized history
+summary_header = "Prior context summary:"
+
+# Sentences, and the ones worth keeping in a summary (decisions, outcomes, numbers)
+_SENTENCE_RE = re.compile(r"[^.!?\n]+[.!?]?")
+_FACT_RE = re.compile(
+    r"\b(?:decided|decision|chose|will|must|error|failed|succeeded|success)\b|\d", re.IGNORECASE
+)
+
+
+def message_role(message):
+    """
+    Role of a chat message, a dict or an SDK message object.
+    """
+    if isinstance(message, dict):
+        return message.get("role")
+    return getattr(message, "role", None)
+
+
+def message_text(message):
+    """
+    Text of a chat message we count toward the token budget (content and tool calls).
+    """
+    if isinstance(message, dict):
+        content, tool_calls = message.get("content"), message.get("tool_calls")
+    else:
+        content, tool_calls = getattr(message, "content", None), getattr(
+            message, "tool_calls", None
+        )
+    text = content if isinstance(content, str) else str(content or "")
+    for call in tool_calls or []:
+        function = call["function"] if isinstance(call, dict) else call.function
+        if isinstance(function, dict):
+            text += function.get("name", "") + function.get("arguments", "")
+        else:
+            text += function.name + function.arguments
+    return text
+
+
+def summarize_messages(messages, max_chars=4000):
+    """
+    Summarize history messages without calling the LLM.
+
+    We keep tool calls (name and arguments), short sentences with decisions,
+    outcomes, or numbers, and the lines of an earlier summary. When the summary
+    is over max_chars, the oldest lines are dropped first.
+    """
+    lines = []
+    for message in messages:
+        role = message_role(message)
+        content = message.get("content") if isinstance(message, dict) else message.content
+        content = content if isinstance(content, str) else str(content or "")
+
+        if role == "system" and content.startswith(summary_header):
+            lines += content[len(summary_header) :].strip().splitlines()
+            continue
+
+        tool_calls = message.get("tool_calls") if isinstance(message, dict) else None
+        for call in tool_calls or []:
+            function = call["function"]
+            lines.append(f"- {role} called {function['name']}({function['arguments'][:200]})")
+
+        for sentence in _SENTENCE_RE.findall(content):
+            sentence = sentence.strip()
+            if sentence and len(sentence) <= 200 and _FACT_RE.search(sentence):
+                lines.append(f"- {role}: {sentence}")
+
+    # Drop repeats (keeping the first), then the oldest lines over the limit
+    lines = list(dict.fromkeys(lines))
+    while lines and sum(len(line) + 1 for line in lines) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class RateLimiter:
+    """
+    Limit requests to rate per period (seconds), allowing bursts of up to rate.
+
+    This is a token bucket, written as a generic cell rate algorithm: we keep the
+    time the bucket would be empty instead of a count of tokens. It doesn't hold
+    a lock, so one limiter can be shared across event loops.
+    """
+
+    def __init__(self, rate, period=60):
+        self.period = period
+        self.interval = period / rate
+        self.empty_at = 0.0
+
+    async def acquire(self):
+        now = time.monotonic()
+        self.empty_at = max(self.empty_at, now) + self.interval
+        delay = self.empty_at - now - self.period
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+# Rate limiters, shared by backends for the same endpoint
+_rate_limiters = {}
+
+
+def get_rate_limiter(base_url=None):
+    """
+    Rate limiter for an endpoint, LLM_RATE_LIMIT requests per minute (0 to disable).
+    """
+    rate = int(os.environ.get("LLM_RATE_LIMIT", 60))
+    if rate <= 0:
+        return None
+    if base_url not in _rate_limiters:
+        _rate_limiters[base_url] = RateLimiter(rate)
+    return _rate_limiters[base_url]
+
+
+# Limits on requests in flight to LLM providers, one per event loop
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_llm_semaphore():
+    """
+    Limit on concurrent LLM requests (LLM_CONCURRENCY), shared by every backend.
+
+    Each step has its own backend, so a limit per backend doesn't bound the
+    process. Semaphores are bound to a loop, so there is one per running loop.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _semaphores:
+        _semaphores[loop] = asyncio.Semaphore(int(os.environ.get("LLM_CONCURRENCY", 16)))
+    return _semaphores[loop]
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model_name):
+    """
+    Tokenizer for a model, falling back to cl100k_base for models tiktoken doesn't know.
+
+    tiktoken is optional (and slow to import), without it we estimate ~4 characters per token.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_name or "")
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
 
 
 class LLMBackend(ABC):
@@ -8,8 +178,47 @@ class LLMBackend(ABC):
     Abstract interface for any LLM provider (Gemini, OpenAI, Llama, Local).
     """
 
+    # Can the provider constrain a response to a json schema (see generate_structured)
+    supports_json_schema = False
+
     def __init__(self):
         self.tools_schema = []
+        self.tools_schema_hash = None
+        self.history = []
+
+        # Most recent (non-system) messages to send for chat backends
+        self.history_window = int(os.environ.get("LLM_HISTORY_WINDOW", 20))
+        self.disable_history = os.environ.get("LLM_DISABLE_HISTORY") is not None
+
+        # Optional token budget for history, and token counts for messages in it
+        max_tokens = os.environ.get("LLM_HISTORY_MAX_TOKENS")
+        self.history_max_tokens = int(max_tokens) if max_tokens else None
+        self.token_counts = {}
+
+        # Context window (tokens), we summarize older history at a fraction of it
+        self.context_window = int(os.environ.get("LLM_CONTEXT_WINDOW", 128000))
+        self.summarize_threshold = float(os.environ.get("LLM_SUMMARIZE_THRESHOLD", 0.8))
+
+        # Optional limit (characters) to truncate tool outputs to in history.
+        # The rest of the output is dropped, so this is off (0) by default
+        self.tool_output_limit = int(os.environ.get("LLM_TOOL_OUTPUT_LIMIT", 0))
+
+        # Sampling temperature, unset means the provider default
+        temperature = os.environ.get("LLM_TEMPERATURE")
+        self.temperature = float(temperature) if temperature else None
+
+        # Retries for transient (rate limit, connection, server) errors
+        self.max_retries = int(os.environ.get("LLM_MAX_RETRIES", 6))
+
+        # Requests per minute to the provider, set by backends that use create_with_retry
+        self.rate_limiter = None
+
+    def reset(self):
+        """
+        Start a new conversation, keeping the client and converted tools.
+        """
+        self.history = []
+        self.token_counts = {}
 
     @abstractmethod
     async def initialize(self, mcp_tools: List[Any]):
@@ -18,41 +227,272 @@ class LLMBackend(ABC):
         """
         pass
 
-    def ensure_json(self, response):
+    def set_tools_schema(self, mcp_tools):
+        """
+        Convert MCP tools to the OpenAI function schema.
+
+        Each tool is built in a fixed key order (type, function name, description,
+        parameters) so the tools block serializes the same way every request and
+        provider prefix caching can hit on it. If the tools are unchanged we keep
+        the same list.
+        """
+        tools_schema = [
+            {
+                "type": "function",
+                "function": {
+                    "name": tool.name,
+                    "description": tool.description,
+                    "parameters": tool.inputSchema,
+                },
+            }
+            for tool in mcp_tools
+        ]
+        content = jsonio.dumps(tools_schema, sort_keys=True)
+        tools_hash = hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+        if tools_hash != self.tools_schema_hash:
+            self.tools_schema = tools_schema
+            self.tools_schema_hash = tools_hash
+            # The hash (not the schema) is enough to spot a cache-busting change
+            logger.debug("Tools schema: %s tools, hash %s", len(tools_schema), tools_hash)
+
+    async def create_with_retry(self, acquire_slot=True, **kwargs):
+        """
+        Create a chat completion (OpenAI-compatible), retrying transient errors.
+
+        Each attempt holds a slot of the LLM semaphore. A caller that has to hold
+        the slot longer (e.g., to read a stream) acquires it and passes acquire_slot=False.
+
+        We back off exponentially with full jitter (capped at 30 seconds) so that
+        rate limited requests don't all come back at once, and wait at least as
+        long as a Retry-After header asks. Bad requests (e.g., a bad tool schema
+        or context length) are not retried.
+        """
+        import openai
+
+        retryable = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            try:
+                slot = get_llm_semaphore() if acquire_slot else contextlib.nullcontext()
+                async with slot:
+                    return await self.completions.create(**kwargs)
+            except retryable as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = random.uniform(0, min(30, 2**attempt))
+                response = getattr(e, "response", None)
+                retry_after = response.headers.get("retry-after") if response is not None else None
+                try:
+                    delay = max(delay, float(retry_after))
+                except (TypeError, ValueError):
+                    pass
+                await asyncio.sleep(delay)
+
+    async def ensure_json(self, response, max_tries=3):
         """
-        Require an LLM to return json.
+        Require an LLM to return json, asking it to fix the response up to max_tries times.
+
+        The fix requests are one_off, so malformed responses never land in history
+        (and are not sent again with every turn after).
         """
-        # TODO: Add a max_retries counter here to prevent infinite recursion
+        for _ in range(max_tries):
+            try:
+                return jsonio.loads(strip_code_fences(response or ""))
+            except jsonio.JSONDecodeError as e:
+                prompt = (
+                    f"Your response {response} was not valid json: {e}. Please return valid JSON."
+                )
+                response, _, _ = await self.generate_response(
+                    prompt=prompt, use_tools=False, one_off=True, json_mode=True
+                )
         try:
-            return json.loads(response)
-        except Exception as e:
-            prompt = f"Your response {response} was not valid json: {e}. Please return valid JSON."
-            # Call self, not self.backend
-            response, _, _ = self.generate_response(prompt=prompt)
-            return self.ensure_json(response)
+            return jsonio.loads(strip_code_fences(response or ""))
+        except jsonio.JSONDecodeError as e:
+            raise ValueError(f"Response was not valid json after {max_tries} tries: {e}")
+
+    async def generate_structured(self, prompt, schema, name="response", one_off=False):
+        """
+        Generate a json object for a schema, and return it parsed.
+
+        Providers that support it constrain decoding to the schema, so the first
+        response is valid. Here we fall back to JSON mode and ensure_json.
+        """
+        response, _, _ = await self.generate_response(
+            prompt=prompt, use_tools=False, one_off=one_off, json_mode=True
+        )
+        return await self.ensure_json(response)
+
+    def sampling_params(self):
+        """
+        Sampling parameters for the request, leaving unset ones to the provider.
+        """
+        if self.temperature is None:
+            return {}
+        return {"temperature": self.temperature}
+
+    async def generate_batch(self, prompts: List[str]):
+        """
+        Answer independent prompts concurrently, bounded by LLM_CONCURRENCY
+        (backends hold the shared semaphore for each request).
+
+        Each prompt is a one_off (stateless) request, so it can run alongside
+        the others without touching the conversation history. Results are
+        (text_content, reasoning_content, tool_calls) in the order of prompts.
+        """
+        return await asyncio.gather(
+            *[
+                self.generate_response(prompt=prompt, use_tools=False, one_off=True)
+                for prompt in prompts
+            ]
+        )
 
-    def select_tools(self, use_tools=True):
+    def count_tokens(self, message):
+        """
+        Count tokens for a history message, once for its lifetime.
+
+        Counts are keyed by id(), and we keep the message with the count so a
+        recycled id for a new object can't return a stale count.
+        """
+        entry = self.token_counts.get(id(message))
+        if entry is not None and entry[0] is message:
+            return entry[1]
+
+        text = message_text(message)
+        encoding = get_encoding(getattr(self, "model_name", None))
+        count = len(encoding.encode_ordinary(text)) if encoding else len(text) // 4
+        self.token_counts[id(message)] = (message, count)
+        return count
+
+    def compact_tool_output(self, content):
+        """
+        Tool output as the (compact) text we send back to the LLM.
+
+        Structured outputs are sent as compact JSON instead of a Python repr. If
+        tool_output_limit is set (LLM_TOOL_OUTPUT_LIMIT), longer text is truncated.
+        """
+        if not isinstance(content, str):
+            try:
+                content = jsonio.dumps(content)
+            except (TypeError, ValueError):
+                content = str(content)
+        if self.tool_output_limit and len(content) > self.tool_output_limit:
+            dropped = len(content) - self.tool_output_limit
+            content = f"{content[:self.tool_output_limit]}...[truncated {dropped} chars]"
+        return content
+
+    def summarize_history(self):
+        """
+        Replace the older half of history with a summary when it nears the context window.
+
+        Tokens are estimated from characters (~4 per token), and the summary is
+        a heuristic one (see summarize_messages), so this doesn't cost a request.
+        The summary is a system message kept after the leading system messages,
+        and is folded into the next summary.
+        """
+        if not self.context_window:
+            return
+        tokens = sum(len(message_text(m)) for m in self.history) // 4
+        if tokens <= self.summarize_threshold * self.context_window:
+            return
+
+        pinned = 0
+        while pinned < len(self.history) and message_role(self.history[pinned]) == "system":
+            pinned += 1
+        if pinned and str(self.history[pinned - 1].get("content", "")).startswith(summary_header):
+            pinned -= 1
+
+        # Like trim_history, the kept messages can't start on a tool message
+        cut = pinned + (len(self.history) - pinned) // 2
+        while cut < len(self.history) and message_role(self.history[cut]) == "tool":
+            cut += 1
+        summarized = self.history[pinned:cut]
+        if not summarized:
+            return
+
+        for message in summarized:
+            self.token_counts.pop(id(message), None)
+        summary = summarize_messages(summarized)
+        self.history[pinned:cut] = [{"role": "system", "content": f"{summary_header}\n{summary}"}]
+        logger.debug("Summarized %s history messages (~%s tokens)", len(summarized), tokens)
+
+    def trim_history(self):
+        """
+        Keep leading system messages and the last history_window messages,
+        and keep history under history_max_tokens when it is set.
+
+        We let the history grow to twice the window before cutting it back.
+        Between cuts the request is append-only, so the provider prompt cache
+        can reuse the whole prefix instead of missing on every turn.
+
+        A tool message must follow the assistant message with its tool_calls,
+        so we never start the window on one (OpenAI rejects the request).
+        """
+        pinned = 0
+        while pinned < len(self.history) and message_role(self.history[pinned]) == "system":
+            pinned += 1
+
+        tokens = None
+        if self.history_max_tokens:
+            tokens = [self.count_tokens(m) for m in self.history]
+        over_budget = tokens is not None and sum(tokens) > self.history_max_tokens
+
+        if len(self.history) - pinned < 2 * self.history_window and not over_budget:
+            return
+        start = max(pinned, len(self.history) - self.history_window)
+
+        # Drop more of the oldest messages until we fit the budget (keep the last)
+        if over_budget:
+            total = sum(tokens[:pinned]) + sum(tokens[start:])
+            while total > self.history_max_tokens and start < len(self.history) - 1:
+                total -= tokens[start]
+                start += 1
+
+        while start < len(self.history) and message_role(self.history[start]) == "tool":
+            start += 1
+        for message in self.history[pinned:start]:
+            self.token_counts.pop(id(message), None)
+        del self.history[pinned:start]
+
+    def select_tools(self, use_tools=True, force_tool: Optional[str] = None):
         """
         Clean logic to decide to use a tool or not for OpenAI-compatible endpoints.
+
+        With force_tool, only that tool is sent and the model must call it.
         """
         if not use_tools or not self.tools_schema:
             return {"tools": None, "tool_choice": None}
 
+        if force_tool:
+            name = force_tool.replace("-", "_")
+            return {
+                "tools": [t for t in self.tools_schema if t["function"]["name"] == name],
+                "tool_choice": {"type": "function", "function": {"name": name}},
+            }
+
         # OpenAI expects auto, none, or required (or specific tool)
         # We default to auto if tools are allowed and present.
         return {"tools": self.tools_schema, "tool_choice": "auto"}
 
     @abstractmethod
-    def generate_response(
+    async def generate_response(
         self,
         prompt: str = None,
         tool_outputs: List[Dict] = None,
         use_tools: bool = True,
         one_off: bool = False,
         tools: List[str] = None,
+        json_mode: bool = False,
+        tool_choice: Union[str, Dict, None] = None,
     ):
         """
         Returns a tuple: (text_content, reasoning_content, tool_calls)
+
+        With json_mode, ask the provider to constrain the response to JSON.
+        A tool_choice ("auto", "required", "none", or a specific function)
+        overrides the default, for when the caller knows if a tool must be called.
         """
         pass
 
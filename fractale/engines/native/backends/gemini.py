@@ -1,12 +1,37 @@
+import asyncio
+import copy
+import hashlib
 import os
-from typing import Any, Dict, List, Tuple
+import weakref
+from typing import Any, Dict, List, Tuple, Union
 
+import fractale.utils.jsonio as jsonio
 from fractale.core.config import ModelConfig
 
-from .base import LLMBackend
+from .base import LLMBackend, get_llm_semaphore
 
 default_model = "gemini-2.5-pro"
 
+# Converted Gemini tools, keyed by the signature of the MCP tools
+_tools_cache = {}
+
+# Gemini clients by event loop and api key
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_client(genai, api_key):
+    """
+    Get (or create) the Gemini client for an api key.
+
+    Each step has a new backend, and a client has its own connection pool,
+    so sharing one keeps connections (and TLS sessions) warm between steps.
+    The async pool is bound to the loop it was used on, so clients are per loop.
+    """
+    clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    if api_key not in clients:
+        clients[api_key] = genai.Client(api_key=api_key)
+    return clients[api_key]
+
 
 class GeminiBackend(LLMBackend):
     def __init__(self, config: ModelConfig):
@@ -22,18 +47,59 @@ class GeminiBackend(LLMBackend):
             raise ValueError("GEMINI_API_KEY environment variable not set.")
 
         self.model_name = config.model_name or default_model
+        if self.temperature is None:
+            self.temperature = 0.0
         self.chat = None
         self.client = None
         self.tools_config = None
+        self.tools_obj = None
+        self._tools_sig = None
         self._usage = {}
 
+    def reset(self):
+        """
+        Start a new conversation. The chat is created again by initialize.
+        """
+        super().reset()
+        self.chat = None
+
     async def initialize(self, mcp_tools: List[Any]):
         """
         Initialize the client and chat session with tools using the new SDK.
+
+        The client is shared (see get_client), and converted tools are reused
+        when the MCP tools have not changed.
+        """
+        sig = self.tools_signature(mcp_tools)
+        if sig == self._tools_sig and self.chat is not None:
+            return
+
+        if self.client is None:
+            self.client = get_client(self.genai, self.api_key)
+
+        if sig not in _tools_cache:
+            _tools_cache[sig] = self.convert_tools(mcp_tools)
+        self.tools_obj = _tools_cache[sig]
+        self._tools_sig = sig
+
+        # In the new SDK, we create the chat via the client
+        # We pass the tools configuration here so the chat session knows about them
+        self.chat = self.client.aio.chats.create(
+            model=self.model_name, config=self.types.GenerateContentConfig(tools=self.tools_obj)
+        )
+
+    def tools_signature(self, mcp_tools):
+        """
+        Content hash of the MCP tools (name, description, and schema).
         """
-        self.client = self.genai.Client(api_key=self.api_key)
+        data = [[t.name, t.description, t.inputSchema] for t in mcp_tools]
+        data = jsonio.dumps(data, sort_keys=True)
+        return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
 
-        # Convert MCP tools to Gemini types...
+    def convert_tools(self, mcp_tools):
+        """
+        Convert MCP tools to Gemini types.
+        """
         function_declarations = []
 
         for tool in mcp_tools:
@@ -44,8 +110,8 @@ class GeminiBackend(LLMBackend):
                     f"Please rename this tool in your MCP Server (e.g. use '{tool.name.replace('-', '_')}')."
                 )
 
-            # Deep copy and clean schema
-            schema = tool.inputSchema.copy()
+            # Deep copy and clean schema (the listing is shared, so don't modify it)
+            schema = copy.deepcopy(tool.inputSchema)
             self._clean_schema(schema)
 
             # Gemini needs specific types, probably for protobuf
@@ -56,15 +122,7 @@ class GeminiBackend(LLMBackend):
 
         # Again, a "Tool" container
         if function_declarations:
-            self.tools_obj = [self.types.Tool(function_declarations=function_declarations)]
-        else:
-            self.tools_obj = None
-
-        # In the new SDK, we create the chat via the client
-        # We pass the tools configuration here so the chat session knows about them
-        self.chat = self.client.chats.create(
-            model=self.model_name, config=self.types.GenerateContentConfig(tools=self.tools_obj)
-        )
+            return [self.types.Tool(function_declarations=function_declarations)]
 
     def _clean_schema(self, obj):
         """
@@ -83,13 +141,15 @@ class GeminiBackend(LLMBackend):
             for item in obj:
                 self._clean_schema(item)
 
-    def generate_response(
+    async def generate_response(
         self,
         prompt: str = None,
         tool_outputs: List[Dict] = None,
         use_tools: bool = True,
         one_off: bool = False,
         tools: List[str] = None,
+        json_mode: bool = False,
+        tool_choice: Union[str, Dict, None] = None,
     ) -> Tuple[str, Any, List[Dict]]:
         """
         Generate response from Gemini using the new SDK patterns.
@@ -97,6 +157,14 @@ class GeminiBackend(LLMBackend):
         # Function calling config
         fc_config = None
 
+        # An OpenAI style tool_choice maps to a function calling mode
+        if isinstance(tool_choice, dict):
+            tools = [tool_choice["function"]["name"]]
+        elif tool_choice == "required" and not tools:
+            tools = [t.name for d in self.tools_obj or [] for t in d.function_declarations]
+        elif tool_choice == "none":
+            use_tools = False
+
         if not use_tools or not self.tools_obj:
             fc_config = self.types.FunctionCallingConfig(mode="NONE")
         elif tools:
@@ -114,70 +182,82 @@ class GeminiBackend(LLMBackend):
         config = self.types.GenerateContentConfig(
             tools=self.tools_obj if use_tools else None,
             tool_config=tool_config_obj,
-            temperature=0.0,
+            temperature=self.temperature,
+            # Gemini doesn't allow a JSON mime type together with function calling
+            response_mime_type="application/json" if json_mode and not use_tools else None,
         )
 
-        response = None
-
-        try:
-            # One-off (stateless)
-            if one_off:
-                if not prompt:
-                    return "", None, []
-                response = self.client.models.generate_content(
-                    model=self.model_name, contents=prompt, config=config
-                )
-
-            # Chat (memory)
-            else:
-                # If we have tool outputs, we are completing a turn
-                if tool_outputs:
-                    parts = []
-                    for output in tool_outputs:
-                        parts.append(
-                            self.types.Part.from_function_response(
-                                name=output["name"].replace("-", "_"),
-                                response={"result": output["content"]},
+        stream = None
+        text_content = ""
+        tool_calls = []
+        has_candidates = False
+
+        # The request holds a slot until its stream is read
+        async with get_llm_semaphore():
+            try:
+                # One-off (stateless)
+                if one_off:
+                    if not prompt:
+                        return "", None, []
+                    stream = await self.client.aio.models.generate_content_stream(
+                        model=self.model_name, contents=prompt, config=config
+                    )
+
+                # Chat (memory)
+                else:
+                    # If we have tool outputs, we are completing a turn
+                    if tool_outputs:
+                        parts = []
+                        for output in tool_outputs:
+                            parts.append(
+                                self.types.Part.from_function_response(
+                                    name=output["name"].replace("-", "_"),
+                                    response={
+                                        "result": self.compact_tool_output(output["content"])
+                                    },
+                                )
                             )
-                        )
-                    # Send the tool outputs back to the chat
-                    response = self.chat.send_message(parts)
+                        # Send the tool outputs back to the chat
+                        stream = await self.chat.send_message_stream(parts)
 
-                # Otherwise, it's a new user prompt
-                elif prompt:
-                    # Update the chat's config for this specific turn
-                    response = self.chat.send_message(prompt, config=config)
+                    # Otherwise, it's a new user prompt
+                    elif prompt:
+                        # Update the chat's config for this specific turn
+                        stream = await self.chat.send_message_stream(prompt, config=config)
 
-        except Exception as e:
-            return f"Error communicating with Gemini: {str(e)}", None, []
+                if not stream:
+                    return "", None, []
 
-        if not response:
-            return "", None, []
+                # Accumulate parts as they arrive. We read the stream to the end (and don't
+                # return on the first function call) because the chat only records the turn
+                # in its history once the stream is exhausted.
+                async for chunk in stream:
+                    # Usage comes with the last chunk
+                    if chunk.usage_metadata:
+                        self._usage = {
+                            "prompt_tokens": chunk.usage_metadata.prompt_token_count,
+                            "completion_tokens": chunk.usage_metadata.candidates_token_count,
+                        }
+
+                    if not chunk.candidates:
+                        continue
+                    has_candidates = True
+                    content = chunk.candidates[0].content
+                    for part in (content.parts if content else None) or []:
+                        if part.text:
+                            text_content += part.text
+
+                        if part.function_call:
+                            tool_calls.append(
+                                {"name": part.function_call.name, "args": part.function_call.args}
+                            )
 
-        # Usage...
-        if response.usage_metadata:
-            self._usage = {
-                "prompt_tokens": response.usage_metadata.prompt_token_count,
-                "completion_tokens": response.usage_metadata.candidates_token_count,
-            }
+            except Exception as e:
+                return f"Error communicating with Gemini: {str(e)}", None, []
 
-        if not response.candidates:
+        if not has_candidates:
             return "Error: Blocked by safety filters or empty response", None, []
 
-        # And content.
-        candidate = response.candidates[0]
-        text_content = ""
-        tool_calls = []
-
-        for part in candidate.content.parts:
-            if part.text:
-                text_content += part.text
-
-            if part.function_call:
-                tool_calls.append(
-                    {"name": part.function_call.name, "args": part.function_call.args}
-                )
-
         reasoning_content = None
         return text_content, reasoning_content, tool_calls
 
@@ -1,63 +1,116 @@
-import json
-import os
-from typing import Any, Dict, List, Tuple
+import logging
+from typing import Any, Dict, List, Tuple, Union
 
-from rich import print
+import openai
 
+import fractale.utils.jsonio as jsonio
 from fractale.core.config import ModelConfig
+from fractale.engines.http_client import get_http_client, llm_timeout
+from fractale.engines.native.cache import CachedChatCompletions
 
-from .base import LLMBackend
+from .base import LLMBackend, get_llm_semaphore, get_rate_limiter
 
+logger = logging.getLogger(__name__)
 
-class OpenAIBackend(LLMBackend):
+# OpenAI clients, shared by backends with the same endpoint and key
+_clients = {}
+
+
+def get_client(base_url=None, api_key=None):
     """
-    Backend to use OpenAI
+    Get (or create) the AsyncOpenAI client for an endpoint.
+
+    All clients send requests through the shared connection pool, so
+    backends (one per step) reuse connections instead of opening their own.
+    """
+    key = (base_url, api_key)
+    if key not in _clients:
+        _clients[key] = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=get_http_client(timeout=llm_timeout),
+            max_retries=0,
+        )
+    return _clients[key]
+
+
+def message_to_dict(msg):
     """
+    Convert an SDK assistant message to the plain dict we keep in history.
 
-    def __init__(self, config: ModelConfig):
-        super().__init__()
-        import openai
+    The dict is a fraction of the size of the pydantic model, and it can be
+    serialized (and copied) like the rest of history.
+    """
+    message = {"role": "assistant", "content": msg.content}
+    if msg.tool_calls:
+        message["tool_calls"] = [
+            {
+                "id": tc.id,
+                "type": "function",
+                "function": {"name": tc.function.name, "arguments": tc.function.arguments},
+            }
+            for tc in msg.tool_calls
+        ]
+    return message
 
-        self.client = openai.OpenAI(api_key=config.api_key, base_url=config.base_url)
-        self.model_name = config.model_name
-        self.history = []
-        self.tools_schema = []
+
+class OpenAICompatibleBackend(LLMBackend):
+    """
+    Shared backend for OpenAI-compatible chat completion endpoints.
+    Subclasses set the connection defaults.
+    """
+
+    # Only some servers (e.g., vLLM with reasoning models) return reasoning_content
+    supports_reasoning_content = False
+
+    def __init__(self, config: ModelConfig, base_url=None, api_key=None, model_name=None):
+        super().__init__()
+        base_url = base_url or config.base_url
+        self.client = get_client(base_url, api_key or config.api_key)
+        self.rate_limiter = get_rate_limiter(base_url)
+        self.completions = CachedChatCompletions(self.client.chat.completions)
+        self.model_name = model_name or config.model_name
         self._usage = {}
 
     async def initialize(self, mcp_tools: List[Any]):
         """
         Convert MCP tools to OpenAI Schema.
         """
-        self.tools_schema = []
-        for tool in mcp_tools:
-            self.tools_schema.append(
-                {
-                    "type": "function",
-                    "function": {
-                        "name": tool.name,
-                        "description": tool.description,
-                        "parameters": tool.inputSchema,
-                    },
-                }
-            )
+        self.set_tools_schema(mcp_tools)
 
-    def generate_response(
+    def system_prompt(self, use_tools=True):
+        """
+        System message to start a conversation with, if any.
+        """
+        return None
+
+    def prepare_request(
         self,
         prompt: str = None,
         tool_outputs: List[Dict] = None,
         use_tools: bool = True,
         one_off: bool = False,
-        tools: List[str] = None,  # <--- NEW ARGUMENT
-    ) -> Tuple[str, str, List[Dict]]:
+        tools: List[str] = None,
+        json_mode: bool = False,
+        tool_choice: Union[str, Dict, None] = None,
+    ):
         """
-        Generate the response and update history.
+        Update history and build the chat completion arguments.
+        A tool_choice (if given) overrides the default "auto".
+        A one_off request is stateless: it doesn't read or update history.
+        A json_mode request asks for a JSON object response.
         """
-        # TODO: Implement one_off logic
-
-        if prompt:
+        if one_off:
+            if not prompt:
+                return None
+            messages = [{"role": "user", "content": prompt}]
+        elif prompt:
+            system_prompt = self.system_prompt(use_tools)
+            if system_prompt and not self.history:
+                self.history.append({"role": "system", "content": system_prompt})
             self.history.append({"role": "user", "content": prompt})
 
-        if tool_outputs:
+        if tool_outputs and not one_off and not self.disable_history:
             for out in tool_outputs:
                 # Match name sanitization (docker-build -> docker_build)
                 llm_name = out["name"].replace("-", "_")
@@ -66,61 +119,217 @@ class OpenAIBackend(LLMBackend):
                         "role": "tool",
                         "tool_call_id": out["id"],
                         "name": llm_name,
-                        "content": str(out["content"]),
+                        "content": self.compact_tool_output(out["content"]),
                     }
                 )
 
         # --- TOOL CONFIGURATION LOGIC ---
-        api_tools = self.tools_schema if self.tools_schema else None
-        tool_choice = "auto" if api_tools else None
-
-        if not use_tools:
-            api_tools = None
-            tool_choice = None
-        elif tools:
-            # 1. Sanitize requested names to match schema
-            target_names = [t.replace("-", "_") for t in tools if t]
-
-            # 2. Filter the schema list passed to the API
-            api_tools = [t for t in self.tools_schema if t["function"]["name"] in target_names]
-
-            # 3. Determine forcing strategy
-            if len(target_names) == 1:
-                # Force specific function
-                tool_choice = {"type": "function", "function": {"name": target_names[0]}}
-            else:
-                # Force any function from the filtered list
-                tool_choice = "required"
-
-        response = self.client.chat.completions.create(
-            model=self.model_name,
-            messages=self.history,
-            tools=api_tools,
-            tool_choice=tool_choice,
+        target_names = [t.replace("-", "_") for t in tools or [] if t]
+        if use_tools and len(target_names) == 1:
+            # Force specific function
+            selected = self.select_tools(force_tool=target_names[0])
+        else:
+            selected = self.select_tools(use_tools)
+        api_tools, choice = selected["tools"], selected["tool_choice"]
+
+        if api_tools and len(target_names) > 1:
+            # Force any function from the filtered list
+            api_tools = [t for t in api_tools if t["function"]["name"] in target_names]
+            choice = "required"
+
+        # The caller's choice wins. With "none" we don't send the tools at all.
+        if api_tools and tool_choice == "none":
+            api_tools, choice = None, None
+        elif api_tools and tool_choice is not None:
+            choice = tool_choice
+
+        if not one_off:
+            self.summarize_history()
+            self.trim_history()
+            messages = self.history
+
+        request = {
+            "model": self.model_name,
+            "messages": messages,
+            "tools": api_tools,
+            "tool_choice": choice,
+            **self.sampling_params(),
+        }
+        # The server constrains decoding to a JSON object
+        if json_mode:
+            request["response_format"] = {"type": "json_object"}
+        return request
+
+    def parse_tool_calls(self, tool_calls):
+        """
+        Convert OpenAI tool calls to the calls the agent runs.
+        """
+        calls = []
+        for tc in tool_calls or []:
+            calls.append(
+                {
+                    "id": tc.id,
+                    "name": tc.function.name,  # Underscored name
+                    "args": jsonio.loads(tc.function.arguments),
+                }
+            )
+        return calls
+
+    async def generate_response(
+        self,
+        prompt: str = None,
+        tool_outputs: List[Dict] = None,
+        use_tools: bool = True,
+        one_off: bool = False,
+        tools: List[str] = None,
+        json_mode: bool = False,
+        tool_choice: Union[str, Dict, None] = None,
+    ) -> Tuple[str, str, List[Dict]]:
+        """
+        Generate the response and update history.
+        """
+        request = self.prepare_request(
+            prompt, tool_outputs, use_tools, one_off, tools, json_mode, tool_choice
         )
+        if request is None:
+            return "", None, []
+        return await self.complete(request, one_off)
+
+    async def generate_structured(self, prompt, schema, name="response", one_off=False):
+        """
+        Generate a json object constrained (strict) to the schema, and return it parsed.
+        """
+        if not self.supports_json_schema:
+            return await super().generate_structured(prompt, schema, name, one_off)
+
+        request = self.prepare_request(prompt, use_tools=False, one_off=one_off)
+        request["response_format"] = {
+            "type": "json_schema",
+            "json_schema": {"name": name, "schema": schema, "strict": True},
+        }
+        response, _, _ = await self.complete(request, one_off)
+        # A refusal has no content, so we still check
+        return await self.ensure_json(response)
 
-        print(response)
+    async def complete(self, request, one_off=False):
+        """
+        Send a prepared request, and record the response in history.
+        """
+        response = await self.create_with_retry(**request)
+
+        logger.debug("Chat completion response: %s", response)
         msg = response.choices[0].message
 
-        self.history.append(msg)
+        if not one_off and not self.disable_history:
+            self.history.append(message_to_dict(msg))
 
         if response.usage:
             self._usage = dict(response.usage)
 
-        tool_calls = []
-        if msg.tool_calls:
-            for tc in msg.tool_calls:
-                tool_calls.append(
-                    {
-                        "id": tc.id,
-                        "name": tc.function.name,  # Underscored name
-                        "args": json.loads(tc.function.arguments),
-                    }
-                )
+        reasoning = ""
+        if self.supports_reasoning_content:
+            reasoning = getattr(msg, "reasoning_content", None) or ""
+        return msg.content or "", reasoning, self.parse_tool_calls(msg.tool_calls)
+
+    async def generate_response_stream(
+        self,
+        prompt: str = None,
+        tool_outputs: List[Dict] = None,
+        use_tools: bool = True,
+        one_off: bool = False,
+        tools: List[str] = None,
+        json_mode: bool = False,
+        tool_choice: Union[str, Dict, None] = None,
+    ):
+        """
+        Stream the response, yielding text as it arrives.
+
+        Yields ("text", delta) events, and then one ("done", (text_content, reasoning_content,
+        tool_calls)) event with the same result generate_response returns. Tool call arguments
+        are complete (and parsed) as soon as the model finishes them. Closing the generator
+        early stops the generation.
+        """
+        request = self.prepare_request(
+            prompt, tool_outputs, use_tools, one_off, tools, json_mode, tool_choice
+        )
+        if request is None:
+            yield "done", ("", None, [])
+            return
+
+        # The request holds a slot until its stream is read
+        async with get_llm_semaphore():
+            stream = await self.create_with_retry(
+                acquire_slot=False, **request, stream=True, stream_options={"include_usage": True}
+            )
+
+            content = ""
+            reasoning = ""
+            partial_calls = {}
+            tool_calls = []
+            finished = False
+            try:
+                async for chunk in stream:
+                    if chunk.usage:
+                        self._usage = dict(chunk.usage)
+                    if not chunk.choices:
+                        continue
 
-        reasoning = getattr(msg, "reasoning_content", "")
-        return msg.content or "", reasoning, tool_calls
+                    delta = chunk.choices[0].delta
+                    if delta.content:
+                        content += delta.content
+                        yield "text", delta.content
+                    if self.supports_reasoning_content:
+                        reasoning += getattr(delta, "reasoning_content", None) or ""
+
+                    # Tool calls arrive in pieces, keyed by their index
+                    for tc in delta.tool_calls or []:
+                        call = partial_calls.setdefault(
+                            tc.index, {"id": None, "name": "", "arguments": ""}
+                        )
+                        call["id"] = tc.id or call["id"]
+                        if tc.function:
+                            call["name"] += tc.function.name or ""
+                            call["arguments"] += tc.function.arguments or ""
+                finished = True
+
+            # The caller can stop early (e.g., once it has what it needs). Closing the
+            # stream stops generation, and we keep the text we got. Unfinished tool calls
+            # are dropped, since history can't have calls without their outputs.
+            finally:
+                await stream.close()
+                if finished:
+                    tool_calls = [
+                        {
+                            "id": call["id"],
+                            "type": "function",
+                            "function": {"name": call["name"], "arguments": call["arguments"]},
+                        }
+                        for _, call in sorted(partial_calls.items())
+                    ]
+                if not one_off and not self.disable_history:
+                    message = {"role": "assistant", "content": content}
+                    if tool_calls:
+                        message["tool_calls"] = tool_calls
+                    self.history.append(message)
+
+        calls = [
+            {
+                "id": call["id"],
+                "name": call["function"]["name"],
+                "args": jsonio.loads(call["function"]["arguments"] or "{}"),
+            }
+            for call in tool_calls
+        ]
+        yield "done", (content, reasoning, calls)
 
     @property
     def token_usage(self):
         return self._usage
+
+
+class OpenAIBackend(OpenAICompatibleBackend):
+    """
+    Backend to use OpenAI
+    """
+
+    supports_json_schema = True
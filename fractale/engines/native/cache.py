@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+
+import fractale.utils.jsonio as jsonio
+
+# Maximum number of LLM responses to hold in memory
+cache_size = int(os.environ.get("FRACTALE_RESPONSE_CACHE_SIZE", 128))
+
+
+class ResponseCache:
+    """
+    In-memory LRU cache of LLM responses, keyed by prompt and model (llm_key).
+
+    This should only hold responses that are deterministic for the key, meaning
+    temperature 0, no tools, and a fresh conversation history.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize or cache_size
+        self.cache = OrderedDict()
+
+    def key(self, prompt, llm_key):
+        return hashlib.blake2b(f"{llm_key}|{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt, llm_key):
+        """
+        Return the cached response, or None on a miss.
+        """
+        key = self.key(prompt, llm_key)
+        if key not in self.cache:
+            return None
+        self.cache.move_to_end(key)
+        return self.cache[key]
+
+    def update(self, prompt, llm_key, value):
+        key = self.key(prompt, llm_key)
+        self.cache[key] = value
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+
+    def clear(self):
+        self.cache.clear()
+
+
+# Shared by every worker in the process
+response_cache = ResponseCache()
+
+
+class DiskCache:
+    """
+    Persistent cache of LLM responses in a sqlite file, with a ttl (seconds).
+    """
+
+    def __init__(self, cache_dir, ttl=None):
+        cache_dir = os.path.expanduser(os.path.expandvars(cache_dir))
+        os.makedirs(cache_dir, exist_ok=True)
+        self.ttl = ttl or int(os.environ.get("LLM_CACHE_TTL", 86400))
+        self.conn = sqlite3.connect(
+            os.path.join(cache_dir, "responses.db"), check_same_thread=False
+        )
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, expires REAL)"
+            )
+
+    def get(self, key):
+        row = self.conn.execute(
+            "SELECT value FROM responses WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires) VALUES (?, ?, ?)",
+                (key, value, time.time() + self.ttl),
+            )
+
+
+_disk_cache = None
+
+
+def get_disk_cache():
+    """
+    The disk cache is opt-in, enabled by setting LLM_CACHE_DIR.
+    """
+    global _disk_cache
+    cache_dir = os.environ.get("LLM_CACHE_DIR")
+    if not cache_dir:
+        return None
+    if _disk_cache is None:
+        _disk_cache = DiskCache(cache_dir)
+    return _disk_cache
+
+
+# Deterministic requests in flight, so identical concurrent requests share one
+_inflight = {}
+
+
+class DecisionCache:
+    """
+    Exact-match cache of finish decisions (is the step done, or what to do next),
+    keyed by the check prompt (with the tool outputs) and model (llm_key).
+
+    A decision is only stored once the step it was made in succeeds, so a
+    decision that led to a failure is never replayed. Decisions are kept in
+    memory, and in the disk cache when it is enabled.
+    """
+
+    def __init__(self, maxsize=None):
+        self.memory = ResponseCache(maxsize)
+
+    def disk_key(self, prompt, llm_key):
+        return "decision:" + self.memory.key(prompt, llm_key)
+
+    def lookup(self, prompt, llm_key):
+        """
+        Return the confirmed decision, or None on a miss.
+        """
+        decision = self.memory.lookup(prompt, llm_key)
+        disk = get_disk_cache()
+        if decision is None and disk is not None:
+            cached = disk.get(self.disk_key(prompt, llm_key))
+            if cached is not None:
+                decision = jsonio.loads(cached)
+                self.memory.update(prompt, llm_key, decision)
+        return decision
+
+    def confirm(self, prompt, llm_key, decision):
+        """
+        Save a decision from a step that succeeded.
+        """
+        self.memory.update(prompt, llm_key, decision)
+        disk = get_disk_cache()
+        if disk is not None:
+            disk.set(self.disk_key(prompt, llm_key), jsonio.dumps(decision))
+
+
+decision_cache = DecisionCache()
+
+
+class CachedChatCompletions:
+    """
+    Wrap (async) OpenAI chat.completions.create with the disk cache.
+
+    Only deterministic requests are cached: temperature 0 and the default
+    ("auto") tool choice, so no forced tool call of any form.
+    Streamed requests are passed through.
+    The key covers everything we send (model, messages, tools, sampling params).
+    Identical deterministic requests that arrive while one is in flight wait
+    for its response instead of sending their own.
+    """
+
+    def __init__(self, completions):
+        self.completions = completions
+        self.cache = get_disk_cache()
+
+    def key(self, kwargs):
+        request = dict(kwargs)
+        request["messages"] = [
+            m if isinstance(m, dict) else m.model_dump(exclude_none=True)
+            for m in kwargs["messages"]
+        ]
+        content = jsonio.dumps(request, sort_keys=True)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    async def create(self, **kwargs):
+        if (
+            kwargs.get("stream")
+            or kwargs.get("temperature") != 0
+            or kwargs.get("tool_choice") not in (None, "auto")
+        ):
+            return await self.completions.create(**kwargs)
+
+        key = self.key(kwargs)
+        if self.cache is not None:
+            from openai.types.chat import ChatCompletion
+
+            cached = self.cache.get(key)
+            if cached is not None:
+                return ChatCompletion.model_validate_json(cached)
+
+        # Futures are bound to a loop, so only share within the running one
+        loop = asyncio.get_running_loop()
+        pending = _inflight.get(key)
+        if pending is not None and pending.get_loop() is loop:
+            return await asyncio.shield(pending)
+
+        pending = loop.create_future()
+        _inflight[key] = pending
+        try:
+            response = await self.completions.create(**kwargs)
+            pending.set_result(response)
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            # Don't warn about an exception nobody else retrieved
+            pending.exception()
+            raise
+        finally:
+            if _inflight.get(key) is pending:
+                del _inflight[key]
+
+        if self.cache is not None:
+            self.cache.set(key, response.model_dump_json())
+        return response
@@ -1,8 +1,10 @@
+import asyncio
 import os
 from datetime import datetime
 
 import fractale.utils as utils
 from fractale.core.context import get_context
+from fractale.engines.http_client import close_http_client
 from fractale.engines.native.result import parse_tool_response
 from fractale.logger import logger
 
@@ -30,12 +32,83 @@ class Manager(AgentBase):
         self.attempts = 0
         self.database = database
         self.metadata = {"status": "Pending"}
+
+        # One event loop (and MCP session) for the whole run, see _await.
+        # Inside a with block, they are kept for every run until the block exits
+        self._loop = None
+        self._session_open = False
+        self._entered = False
+
+        # One worker per step name, reset when the step runs again
+        self._agent_pool = {}
         self.init()
 
+    def _await(self, coro):
+        """
+        Run a coroutine on the manager's event loop.
+
+        The loop lives until close, so the MCP session and the connection pools
+        (which are bound to a loop) are reused by every step instead of being
+        set up again for a new loop each time. Use the manager as a context
+        manager to also keep them across runs. Inside a running loop (e.g., Jupyter)
+        we fall back to run_sync.
+        """
+        try:
+            asyncio.get_running_loop()
+            return utils.run_sync(coro)
+        except RuntimeError:
+            pass
+
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        if not self._session_open:
+            self._loop.run_until_complete(self.__aenter__())
+            self._session_open = True
+        return self._loop.run_until_complete(coro)
+
+    def close(self):
+        """
+        Close the MCP session, the connection pool, and the event loop.
+        """
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            if self._session_open:
+                self._loop.run_until_complete(self.__aexit__(None, None, None))
+            self._loop.run_until_complete(close_http_client())
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+        finally:
+            self._session_open = False
+            self._loop.close()
+
+    def __enter__(self):
+        self._entered = True
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._entered = False
+        self.close()
+
     def run(self, context_input):
         """
         Main entry point.
+        Synchronous wrapper around arun, on the manager's event loop.
+
+        Outside of a with block the run owns the loop, so we close it after.
+        """
+        try:
+            return self._await(self.arun(context_input))
+        finally:
+            if not self._entered:
+                self.close()
+
+    async def arun(self, context_input):
+        """
         Merges inputs, validates against server, and starts FSM loop.
+
+        The whole run is one coroutine, so steps are awaited on the same loop.
+        Steps are not run concurrently: the next state depends on the outcome
+        of the current one.
         """
         context = get_context(context_input)
         context.managed = True
@@ -46,9 +119,7 @@ class Manager(AgentBase):
                 context[k] = v
 
         # Connect and validate against server
-        # We use run_sync to bridge the async validation method
-        # God I hate asyncio
-        utils.run_sync(self.connect_and_validate())
+        await self.connect_and_validate()
 
         # Setup State Machine Engine
         # The manager here creates a state machine
@@ -69,9 +140,9 @@ class Manager(AgentBase):
         tracker = []
         try:
             while True:
-                step_meta, finished = sm.run_cycle()
+                step_meta, finished = await sm.run_cycle()
                 if step_meta:
-                    tracker.append(step_meta)
+                    tracker.append(self.record_step(step_meta))
 
                 # Are we done? We need to break from True
                 if finished:
@@ -87,7 +158,7 @@ class Manager(AgentBase):
                     break
 
             # Save and return
-            self.save_results(tracker)
+            await self.save_results(tracker)
             return tracker
 
         except Exception as e:
@@ -95,11 +166,11 @@ class Manager(AgentBase):
             logger.error(f"Orchestration failed: {e}")
             raise e
 
-    def run_agent(self, step, context):
+    async def run_agent(self, step, context):
         """
         Runs the WorkerAgent for an 'agent' type step.
         """
-        self.ui.log_start(step.name, step.description, step.spec.get("inputs", {}))
+        self.ui.log_start(step.name, step.description, step.inputs)
         if not hasattr(context, "agent_config"):
             context.agent_config = {}
 
@@ -108,21 +179,24 @@ class Manager(AgentBase):
                 "step_ref": step,
                 "source_prompt": step.prompt,
                 "step_name": step.name,
-                "tool": step.spec.get("tool"),
+                "tool": step.tool,
             }
         )
 
         # The worker agent will work on successfully executing a step
-        agent = WorkerAgent(
-            name=step.name,
-            step=step,
-            # Prefer step limit, fallback to global manager limit
-            max_attempts=step.spec.get("inputs", {}).get("max_attempts", self.max_attempts),
-            ui=self.ui,
-        )
+        # Prefer step limit, fallback to global manager limit
+        max_attempts = self.max_attempts if step.max_attempts is None else step.max_attempts
+        agent = self._agent_pool.get(step.name)
+        if agent is None:
+            agent = WorkerAgent(
+                name=step.name, step=step, max_attempts=max_attempts, ui=self.ui, session=self
+            )
+            self._agent_pool[step.name] = agent
+        else:
+            agent.reset(step, max_attempts)
 
         try:
-            result_ctx = agent.run(context)
+            result_ctx = await agent.arun(context)
             result = result_ctx.get("result")
             error = result_ctx.get("error_message")
             self.ui.log_finish(step.name, result, error, agent.metadata)
@@ -132,24 +206,21 @@ class Manager(AgentBase):
             self.ui.log_finish(step.name, None, str(e), agent.metadata)
             return None, str(e), agent.metadata
 
-    def run_tool(self, step, context=None):
+    async def run_tool(self, step, context=None):
         """
         Runs a deterministic Tool directly (no LLM).
         """
-        self.ui.log_start(step.name, step.description, step.spec.get("args", {}))
+        self.ui.log_start(step.name, step.description, step.args)
 
         tool_name = step.tool
         start_time = datetime.now()
-        tool_args = utils.resolve_templates(step.spec.get("args", {}), context)
+        tool_args = utils.resolve_templates(step.args, context)
 
         try:
             logger.info(f"🛠️ Executing Tool: {tool_name}")
 
-            async def call():
-                async with self.client:
-                    return await self.client.call_tool(tool_name, tool_args)
-
-            raw_result = utils.run_sync(call())
+            async with self:
+                raw_result = await self.client.call_tool(tool_name, tool_args)
             parsed = parse_tool_response(raw_result)
             self.ui.log_update(parsed.content)
             self.ui.log_finish(step.name, parsed.content, parsed.error_message, {})
@@ -166,37 +237,49 @@ class Manager(AgentBase):
         """
         Async helper to setup client and check server capabilities.
         """
-        async with self.client:
-            server_prompts_page = await self.client.list_prompts()
+        async with self:
+            server_prompts_page = await self.list_prompts()
 
             if hasattr(server_prompts_page, "prompts"):
                 prompts_list = server_prompts_page.prompts
             else:
                 prompts_list = server_prompts_page
 
-            schema_map = {}
-            available_names = set()
-
-            for p in prompts_list:
-                available_names.add(p.name)
-                args = {arg.name for arg in p.arguments} if p.arguments else set()
-                schema_map[p.name] = args
+            # Prompt name -> argument names
+            schema_map = {
+                p.name: frozenset(arg.name for arg in p.arguments or ()) for p in prompts_list
+            }
 
             logger.info(f"🔎 Validating {len(self.plan.states)} states against server...")
 
-            for step in self.plan.states.values():
-                if step.type == "agent":
-                    if step.prompt not in available_names:
-                        raise ValueError(
-                            f"❌ Plan Error: Unknown Persona '{step.prompt}' in step '{step.name}'"
-                        )
-                    step.set_schema(schema_map[step.prompt])
+            # Report every unknown persona at once, not just the first
+            agents = [step for step in self.plan.states.values() if step.type == "agent"]
+            missing = [step for step in agents if step.prompt not in schema_map]
+            if missing:
+                unknown = ", ".join(f"'{s.prompt}' in step '{s.name}'" for s in missing)
+                raise ValueError(
+                    f"❌ Plan Error: Unknown Persona {unknown}. Available: {sorted(schema_map)}"
+                )
+            for step in agents:
+                step.set_schema(schema_map[step.prompt])
 
             logger.info("✅ Personas validated and schemas synced.")
 
-    def save_results(self, tracker):
+    def record_step(self, step_meta):
+        """
+        Save a finished step to the database if it takes them incrementally.
+        Then we only keep the step in memory without its (large) metadata.
+        """
+        if not self.database or not self.database.append_step(step_meta):
+            return step_meta
+        return {k: v for k, v in step_meta.items() if k != "metadata"}
+
+    async def save_results(self, tracker):
         """
         Delegates saving to the configured Database backend.
+
+        The (blocking) save runs in a worker thread, so it doesn't block the
+        event loop, but the run still waits for it and sees any error.
         """
         if not self.database:
             return
@@ -207,5 +290,4 @@ class Manager(AgentBase):
             "status": self.metadata.get("status"),
             "metadata": self.metadata,
         }
-
-        self.database.save(data)
+        await asyncio.to_thread(self.database.save, data)
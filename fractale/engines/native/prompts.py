@@ -1,7 +1,10 @@
-import copy
+import os
+from functools import lru_cache
 
 from jinja2 import Template
 
+from fractale.logger import logger
+
 template = """
     Persona:
     {{persona}}
@@ -15,15 +18,31 @@ template = """
     {% endfor %}{% endif %}
 """
 
+# System prompts for chat backends that need one (e.g., Llama)
+with_tools = "You are a helpful assistant with access to tools. Call a tool when you need one to complete the task, and otherwise respond directly."
+without_tools = "You are a helpful assistant. Respond directly to the task, without calling tools."
+
+# Retry prompts, formatted with the failed response
+FORMAT_ERROR_TEMPLATE = "The previous attempt failed:\n{content}\nYou MUST generate a code block or string that can be parsed into JSON."
+ERROR_TEMPLATE = (
+    "The previous attempt failed:\n{content}\nPlease regenerate and/or fix inputs and retry."
+)
+
+
+@lru_cache(maxsize=128)
+def compile_template(source):
+    """
+    Jinja2 compiles a template to Python on every Template(), so do it once per source.
+    """
+    return Template(source)
+
 
 def was_format_error_prompt(content):
-    return f"The previous attempt failed:\n{content}\nYou MUST generate a code block or string that can be parsed into JSON."
+    return FORMAT_ERROR_TEMPLATE.format(content=content)
 
 
 def was_error_prompt(content):
-    return (
-        f"The previous attempt failed:\n{content}\nPlease regenerate and/or fix inputs and retry."
-    )
+    return ERROR_TEMPLATE.format(content=content)
 
 
 class Prompt:
@@ -45,17 +64,21 @@ class Prompt:
         """
         Render the final user task, and then the full prompt.
         """
-        # The kwargs are rendered into task
-        render = copy.deepcopy(self.data)
+        # The kwargs are rendered into task. We only replace top level keys,
+        # so a shallow copy is enough to leave self.data untouched.
+        render = dict(self.data)
 
         # Do we have additional details for instrucitons?
         try:
-            render["instructions"] += (self.context.get("details") or "").split("\n")
-        except:
-            print("ISSUE WITH RENDER IN GENERIC PROMPTS")
-            import IPython
-
-            IPython.embed()
-        render["task"] = Template(self.data["task"]).render(**kwargs)
-        prompt = Template(template).render(**render)
+            details = (self.context.get("details") or "").split("\n")
+            render["instructions"] = render["instructions"] + details
+        except Exception as e:
+            logger.warning(f"Issue adding details to prompt instructions: {e}")
+            # IPython is slow to import, so only when asked for
+            if os.environ.get("FRACTALE_DEBUG_EMBED"):
+                from IPython import embed
+
+                embed()
+        render["task"] = compile_template(self.data["task"]).render(**kwargs)
+        prompt = compile_template(template).render(**render)
         return prompt
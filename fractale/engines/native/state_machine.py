@@ -1,9 +1,7 @@
-import json
 import logging
 
-from rich import print
-
 import fractale.utils as utils
+import fractale.utils.jsonio as jsonio
 
 logger = logging.getLogger(__name__)
 
@@ -37,7 +35,7 @@ class WorkflowStateMachine:
             keys = [k for k, v in self.states.items() if v.type != "final"]
             self.current_state_name = keys[0] if keys else "failed"
 
-    def run_cycle(self):
+    async def run_cycle(self):
         """
         Executes ONE state and determines the next state.
 
@@ -47,27 +45,27 @@ class WorkflowStateMachine:
 
         # Are we terminal? That sounds dark...
         if current_step.type == "final":
-            print("Current step is final, returning finished")
+            logger.debug("Current step is final, returning finished")
             return None, True
 
         # Execute via callback function
-        print(f"Step type: {current_step.type}")
+        logger.debug("Step type: %s", current_step.type)
         runner = self.callbacks.get(current_step.type)
         if not runner:
             raise ValueError(f"No runner for type '{current_step.type}'")
 
-        # Merge into temp context for execution
-        step_inputs = utils.resolve_templates(current_step.spec.get("inputs", {}), self.context)
+        # Merge into temp context for execution (most steps have no inputs)
         exec_context = self.context.copy()
-        exec_context.update(step_inputs)
-        result, error, meta = runner(current_step, exec_context)
+        if current_step.inputs:
+            exec_context.update(utils.resolve_templates(current_step.inputs, self.context))
+        result, error, meta = await runner(current_step, exec_context)
 
         # Ensure any rendering (jinja2) is carried forward to inputs
         self.update_context(current_step.name, result, error)
 
         # Save previous result and last error in context
         if error:
-            print(error)
+            logger.debug("Step %s error: %s", current_step.name, error)
 
         # Determine Transition
         outcome = "success" if (result and not error) else "failure"
@@ -78,7 +76,6 @@ class WorkflowStateMachine:
             next_state = "success"
         elif not next_state and outcome == "failure":
             next_state = "failed"
-        print(f"next state is {next_state}")
 
         logger.info(f"🔀 Transition: {current_step.name} ({outcome}) -> {next_state}")
         prev_state_name = self.current_state_name
@@ -106,7 +103,7 @@ class WorkflowStateMachine:
             parsed_data = result
             if isinstance(result, str):
                 try:
-                    parsed_data = json.loads(result)
+                    parsed_data = jsonio.loads(result)
                 except Exception:
                     parsed_data = result
 
@@ -0,0 +1,62 @@
+import logging
+from importlib.metadata import PackageNotFoundError, version
+
+# This file exists to patch library behavior we depend on.
+
+logger = logging.getLogger(__name__)
+
+
+def parse_version(value):
+    """
+    Tuple of the leading integer parts of a version string.
+    """
+    parts = []
+    for part in value.split("."):
+        digits = "".join(c for c in part if c.isdigit())
+        if not digits:
+            break
+        parts.append(int(digits))
+    return tuple(parts)
+
+
+def patch_sse_response():
+    """
+    Drain the SSE stream to EOF instead of closing it after the first response.
+
+    The mcp streamable http client calls response.aclose() as soon as the
+    JSON-RPC response arrives. Closing a partially read response drops the
+    keepalive connection (and can stall the next request on the socket), which
+    hurts us because we make many serial call_tool requests to the same server.
+    """
+    try:
+        if parse_version(version("mcp")) > (1, 27, 1):
+            return
+        from httpx_sse import EventSource
+        from mcp.client.streamable_http import StreamableHTTPTransport
+    except (PackageNotFoundError, ImportError):
+        return
+
+    async def _handle_sse_response(self, response, ctx, is_initialization=False):
+        try:
+            event_source = EventSource(response)
+            is_complete = False
+            async for sse in event_source.aiter_sse():
+                # Once we have the response, keep reading so the connection is reusable
+                if is_complete:
+                    continue
+                is_complete = await self._handle_sse_event(
+                    sse,
+                    ctx.read_stream_writer,
+                    resumption_callback=(
+                        ctx.metadata.on_resumption_token_update if ctx.metadata else None
+                    ),
+                    is_initialization=is_initialization,
+                )
+        except Exception as e:
+            logger.exception("Error reading SSE stream:")
+            await ctx.read_stream_writer.send(e)
+
+    StreamableHTTPTransport._handle_sse_response = _handle_sse_response
+
+
+patch_sse_response()
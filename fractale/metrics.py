@@ -1,5 +1,3 @@
-import json
-import time
 from dataclasses import asdict, dataclass, field
 from typing import Any, Dict, List
 
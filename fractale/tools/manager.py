@@ -2,6 +2,7 @@ import importlib
 import inspect
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict
 
@@ -13,6 +14,9 @@ from fastmcp.tools import Tool
 
 from .base import BaseTool
 
+# Tool modules to import at once when loading tools
+load_workers = int(os.environ.get("FRACTALE_TOOL_LOAD_WORKERS", 8))
+
 
 class ToolManager:
 
@@ -118,7 +122,7 @@ class ToolManager:
                 print(f"⚠️  No tools match pattern: '{name}'")
             to_load.update(matches)
 
-        # Load and Register a tool module
+        selected = []
         for name in to_load:
 
             # Inclusion and exclusion
@@ -126,9 +130,19 @@ class ToolManager:
                 continue
             if exclude and re.search(exclude, name):
                 continue
+            selected.append(name)
+
+        # Importing tool modules is the slow part, so we do that in threads.
+        # Registration with the server stays here, in order.
+        instances = []
+        if selected:
+            with ThreadPoolExecutor(max_workers=min(load_workers, len(selected))) as executor:
+                instances = list(executor.map(self.load_tool, selected))
+
+        # Register a tool module
+        for instance in instances:
 
             # This is a tool instance. A tool instance can have 1+ functions
-            instance = self.load_tool(name)
             if not instance:
                 continue
 
@@ -1,8 +1,6 @@
 import json
 import subprocess
-from typing import Any, Dict, Optional
-
-from rich import print
+from typing import Any, Dict
 
 from fractale.logger.logger import logger
 
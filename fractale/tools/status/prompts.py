@@ -10,8 +10,8 @@ REQUIRES = [
 ]
 
 
-def get_status_text(content):
-    return f"""
+# Everything but the step output is fixed, so we build it once
+STATUS_PREFIX = f"""
 ### PERSONA
 {PERSONA}
 
@@ -20,9 +20,14 @@ def get_status_text(content):
 
 ### GOAL
 Look at the step output and determine if the step has failed or succeeded.
-{content}
+"""
 
+STATUS_SUFFIX = f"""
 ### INSTRUCTIONS
 You must adhere to these rules strictly:
 {prompts.format_rules(REQUIRES)}
 """
+
+
+def get_status_text(content):
+    return "".join((STATUS_PREFIX, content, "\n", STATUS_SUFFIX))
@@ -1,4 +1,3 @@
-import json
 import os
 import platform
 import re
@@ -9,6 +8,14 @@ from contextlib import contextmanager
 
 import yaml
 
+from . import jsonio
+
+# libyaml's C loader is much faster, when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 
 def run_sync(coroutine):
     """
@@ -46,12 +53,12 @@ def read_json(filename):
     """
     Read json from file
     """
-    return json.loads(read_file(filename))
+    return jsonio.loads(read_file(filename))
 
 
 def write_json(obj, filename):
     with open(filename, "w") as fd:
-        fd.write(json.dumps(obj, indent=4))
+        fd.write(jsonio.dumps(obj, indent=True))
 
 
 def load_jobspec(filename):
@@ -142,7 +149,7 @@ def read_yaml(filename):
     Read yaml from file
     """
     with open(filename, "r") as fd:
-        content = yaml.safe_load(fd)
+        content = yaml.load(fd, Loader=SafeLoader)
     return content
 
 
@@ -0,0 +1,51 @@
+import json
+import os
+from collections import deque
+
+# orjson is much faster, but set FRACTALE_STDLIB_JSON to use the standard library
+# (e.g., to debug a serialization difference)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if os.environ.get("FRACTALE_STDLIB_JSON"):
+    orjson = None
+
+# orjson.JSONDecodeError is a subclass of this one
+JSONDecodeError = json.JSONDecodeError
+
+
+def default(obj):
+    """
+    Serialize the containers we keep in metadata that json doesn't know about.
+    """
+    if isinstance(obj, (deque, set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def loads(content):
+    """
+    Load json from a string or bytes.
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def dumps(obj, indent=False, sort_keys=False):
+    """
+    Dump json to a (compact) string. orjson only supports an indent of 2.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default, option=option).decode("utf-8")
+
+    if indent:
+        return json.dumps(obj, indent=2, sort_keys=sort_keys, default=default)
+    return json.dumps(obj, sort_keys=sort_keys, separators=(",", ":"), default=default)
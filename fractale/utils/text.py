@@ -1,4 +1,13 @@
 import re
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def code_block_pattern(code_type):
+    """
+    Compiled pattern for a code block of a type (compiled once per type).
+    """
+    return re.compile(f"```(?:{code_type})?\n(.*?)```", re.DOTALL)
 
 
 def get_code_block(content, code_type=None):
@@ -6,8 +15,7 @@ def get_code_block(content, code_type=None):
     Parse a code block from the response
     """
     code_type = code_type or r"[\w\+\-\.]*"
-    pattern = f"```(?:{code_type})?\n(.*?)```"
-    match = re.search(pattern, content, re.DOTALL)
+    match = code_block_pattern(code_type).search(content)
     if match:
         return match.group(1).strip()
     if content.startswith(f"```{code_type}"):
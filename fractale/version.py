@@ -18,6 +18,8 @@ INSTALL_REQUIRES = (
     ("mcp", {"min_version": None}),
     ("fastmcp", {"min_version": None}),
     ("fastapi", {"min_version": None}),
+    ("httpx", {"min_version": None}),
+    ("orjson", {"min_version": None}),
     # Yeah, probably overkill, just being used for printing the scripts
     ("rich", {"min_version": None}),
     ("textual", {"min_version": None}),